@@ -1,7 +1,10 @@
 from django.contrib import admin
-from .models import Vendor, PurchaseOrder, HistoricalPerformance
+from .models import Vendor, PurchaseOrder, HistoricalPerformance, VendorMetrics, MetricRecomputeJob, PurchaseOrderItem
 
 
 admin.site.register(Vendor)
 admin.site.register(PurchaseOrder)
 admin.site.register(HistoricalPerformance)
+admin.site.register(VendorMetrics)
+admin.site.register(MetricRecomputeJob)
+admin.site.register(PurchaseOrderItem)
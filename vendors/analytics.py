@@ -0,0 +1,293 @@
+"""
+Fleet-wide analytics over all vendors.
+
+``PurchaseOrder`` and ``HistoricalPerformance`` are read in one streamed pass
+each into compact NumPy columns: timestamps as int64 microseconds since the
+epoch (``NULL_TIME`` for missing values), status as int8 codes, and ratings and
+metrics as float64 (NaN for missing ratings). The conversions happen in SQL, so rows
+are fed to ``np.fromiter`` without per-value Python work. Every statistic is then computed with vectorised
+operations, grouping by vendor or month with ``np.unique``/``np.bincount``
+instead of per-vendor queries.
+
+The report is cached in the default cache for ``VMS_ANALYTICS_TTL`` seconds.
+NumPy is an optional dependency; ``analytics_available()`` tells whether it is
+installed.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import NotSupportedError, connections
+from django.db.models import BigIntegerField, Case, F, FloatField, Func, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import HistoricalPerformance, PurchaseOrder
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+CACHE_KEY = 'vms:analytics:report'
+EXTRACT_CHUNK_SIZE = 5000
+
+STATUS_CODES = {status: code for code, (status, label) in enumerate(PurchaseOrder.STATUS_CHOICES)}
+NULL_TIME = -(2 ** 63)
+PERCENTILES = (50, 90, 95, 99)
+RATE_BINS = 10
+QUALITY_BIN_WIDTH = 0.5
+MAX_QUALITY = 5.0
+
+HISTORY_METRICS = ('on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate')
+
+
+def analytics_available():
+    return np is not None
+
+
+class EpochMicroseconds(Func):
+    """Microseconds since the Unix epoch of a datetime, as a database integer.
+
+    Computed in SQL so that rows arrive as plain numbers instead of going
+    through Django's per-value datetime converters. On SQLite it is derived
+    from ``julianday()``, which is precise to a few tens of microseconds.
+    """
+    output_field = BigIntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f'EpochMicroseconds is not supported on {connection.vendor}')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(ROUND((julianday(%(expressions)s) - 2440587.5) * 86400000000) AS INTEGER)',
+            **extra_context,
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(ROUND(EXTRACT(EPOCH FROM %(expressions)s) * 1000000) AS BIGINT)',
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(ROUND(UNIX_TIMESTAMP(%(expressions)s) * 1000000) AS SIGNED)',
+            **extra_context,
+        )
+
+
+def _time(field):
+    return Coalesce(EpochMicroseconds(field), Value(NULL_TIME), output_field=BigIntegerField())
+
+
+def _rating(field):
+    # NULL cannot become NaN in SQL; missing ratings are read as -1 and
+    # replaced once the column is loaded.
+    return Coalesce(field, Value(-1.0), output_field=FloatField())
+
+
+def _columns(records, ratings=()):
+    columns = {name: np.ascontiguousarray(records[name]) for name in records.dtype.names}
+    for name in ratings:
+        columns[name][columns[name] < 0] = np.nan
+    return columns
+
+
+def _rows(queryset):
+    """Stream the raw rows of a ``values_list()`` queryset.
+
+    The select list is already plain numbers, so the rows skip the ORM's
+    per-value converters and are read straight from the cursor. Every column
+    must be an expression (``F()`` for plain fields): the SQL selects fields
+    before expressions, and only the ORM's own iterator restores the order.
+    """
+    compiler = queryset.query.get_compiler(using=queryset.db)
+    sql, params = compiler.as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(EXTRACT_CHUNK_SIZE):
+            yield from rows
+
+
+def extract_orders():
+    """Return the purchase orders as a dict of column arrays."""
+    dtype = np.dtype([
+        ('vendor', np.int64),
+        ('status', np.int8),
+        ('order_date', np.int64),
+        ('issue_date', np.int64),
+        ('acknowledgment_date', np.int64),
+        ('delivery_date', np.int64),
+        ('completion_date', np.int64),
+        ('quality_rating', np.float64),
+    ])
+    status_code = Case(
+        *(When(status=status, then=Value(code)) for status, code in STATUS_CODES.items()),
+        default=Value(-1), output_field=IntegerField(),
+    )
+    orders = PurchaseOrder.objects.order_by().values_list(
+        F('vendor_id'), status_code, _time('order_date'), _time('issue_date'), _time('acknowledgment_date'),
+        _time('delivery_date'), _time('completion_date'), _rating('quality_rating'),
+    )
+    return _columns(np.fromiter(_rows(orders), dtype=dtype), ratings=('quality_rating',))
+
+
+def extract_history():
+    """Return the performance snapshots as a dict of column arrays."""
+    dtype = np.dtype([('vendor', np.int64), ('date', np.int64)] + [(name, np.float64) for name in HISTORY_METRICS])
+    snapshots = HistoricalPerformance.objects.order_by().values_list(
+        F('vendor_id'), _time('date'), *(F(name) for name in HISTORY_METRICS),
+    )
+    return _columns(np.fromiter(_rows(snapshots), dtype=dtype))
+
+
+def _number(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _percentiles(values):
+    if not values.size:
+        return {f'p{p}': None for p in PERCENTILES}
+    return {f'p{p}': _number(value) for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _histogram(values, bins, value_range):
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return [
+        {'from': _number(low), 'to': _number(high), 'count': int(count)}
+        for low, high, count in zip(edges[:-1], edges[1:], counts)
+    ]
+
+
+def _group_mean(groups, values, mask, size):
+    """Mean of ``values[mask]`` per group index; NaN for empty groups."""
+    counts = np.bincount(groups[mask], minlength=size)
+    sums = np.bincount(groups[mask], weights=values[mask], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts, counts
+
+
+def _months(micros):
+    """Month index (months since 1970-01) of int64 microsecond timestamps."""
+    return micros.astype('datetime64[us]').astype('datetime64[M]').astype(np.int64)
+
+
+def _month_label(index):
+    return str(np.datetime64(int(index), 'M'))
+
+
+def _deltas(values):
+    deltas = np.full(values.shape, np.nan)
+    deltas[1:] = np.diff(values)
+    return deltas
+
+
+def order_statistics(orders):
+    vendor_ids, vendor_index = np.unique(orders['vendor'], return_inverse=True)
+    vendors = vendor_ids.size
+    completed = orders['status'] == STATUS_CODES['completed']
+    acknowledged = orders['acknowledgment_date'] != NULL_TIME
+    stamped = completed & (orders['completion_date'] != NULL_TIME)
+    on_time = stamped & (orders['completion_date'] <= orders['delivery_date'])
+    rated = completed & ~np.isnan(orders['quality_rating'])
+
+    response_seconds = (orders['acknowledgment_date'] - orders['issue_date']) / 1_000_000
+    vendor_response, _ = _group_mean(vendor_index, response_seconds, acknowledged, vendors)
+    vendor_on_time, vendor_completed = _group_mean(vendor_index, on_time.astype(np.float64), completed, vendors)
+    vendor_quality, _ = _group_mean(vendor_index, orders['quality_rating'], rated, vendors)
+    quality_bins = int(MAX_QUALITY / QUALITY_BIN_WIDTH)
+
+    return {
+        'orders': int(orders['vendor'].size),
+        'vendors_with_orders': int(vendors),
+        'status_counts': {status: int(np.count_nonzero(orders['status'] == code)) for status, code in STATUS_CODES.items()},
+        'response_time_seconds': {
+            'orders': _percentiles(response_seconds[acknowledged]),
+            'vendor_averages': _percentiles(vendor_response[~np.isnan(vendor_response)]),
+        },
+        'on_time_delivery': {
+            'rate': _number(np.count_nonzero(on_time) / np.count_nonzero(completed)) if completed.any() else None,
+            'vendor_rates': _histogram(vendor_on_time[vendor_completed > 0], RATE_BINS, (0.0, 1.0)),
+        },
+        'quality_rating': {
+            'orders': _histogram(orders['quality_rating'][rated], quality_bins, (0.0, MAX_QUALITY)),
+            'vendor_averages': _histogram(vendor_quality[~np.isnan(vendor_quality)], quality_bins, (0.0, MAX_QUALITY)),
+        },
+        'monthly': monthly_order_statistics(orders, completed, on_time, rated),
+    }
+
+
+def monthly_order_statistics(orders, completed, on_time, rated):
+    if not orders['order_date'].size:
+        return []
+    months, month_index = np.unique(_months(orders['order_date']), return_inverse=True)
+    size = months.size
+    counts = np.bincount(month_index, minlength=size)
+    completed_counts = np.bincount(month_index[completed], minlength=size).astype(np.float64)
+    on_time_counts = np.bincount(month_index[on_time], minlength=size)
+    quality, _ = _group_mean(month_index, orders['quality_rating'], rated, size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        on_time_rate = on_time_counts / completed_counts
+        fulfillment_rate = completed_counts / counts
+
+    series = {
+        'orders': counts,
+        'on_time_delivery_rate': on_time_rate,
+        'fulfillment_rate': fulfillment_rate,
+        'quality_rating_avg': quality,
+    }
+    deltas = {name: _deltas(values) for name, values in series.items()}
+    return [
+        {
+            'month': _month_label(month),
+            **{name: _number(values[index]) for name, values in series.items()},
+            'change': {name: _number(values[index]) for name, values in deltas.items()},
+        }
+        for index, month in enumerate(months)
+    ]
+
+
+def history_statistics(history):
+    """Month-over-month change of the fleet average of each snapshot metric."""
+    if not history['date'].size:
+        return []
+    months, month_index = np.unique(_months(history['date']), return_inverse=True)
+    everything = np.ones(month_index.size, dtype=bool)
+    averages = {
+        name: _group_mean(month_index, history[name], everything, months.size)[0] for name in HISTORY_METRICS
+    }
+    deltas = {name: _deltas(values) for name, values in averages.items()}
+    snapshots = np.bincount(month_index, minlength=months.size)
+    return [
+        {
+            'month': _month_label(month),
+            'snapshots': int(snapshots[index]),
+            **{name: _number(values[index]) for name, values in averages.items()},
+            'change': {name: _number(values[index]) for name, values in deltas.items()},
+        }
+        for index, month in enumerate(months)
+    ]
+
+
+def build_report():
+    return {
+        'generated_at': timezone.now(),
+        'purchase_orders': order_statistics(extract_orders()),
+        'historical_performance': history_statistics(extract_history()),
+    }
+
+
+def analytics_report(refresh=False):
+    """Return the cached report, rebuilding it when missing, expired or ``refresh``."""
+    report = None if refresh else cache.get(CACHE_KEY)
+    if report is None:
+        report = build_report()
+        cache.set(CACHE_KEY, report, timeout=getattr(settings, 'VMS_ANALYTICS_TTL', 300))
+    return report
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class VendorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vendors'
+
+    def ready(self):
+        from . import authentication  # noqa: F401  (connects the identity cache receivers)
+        from . import checks  # noqa: F401  (registers the system checks)
+        from .db import configure_sqlite
+        from .instrumentation import install_query_recorder
+        from .search import ensure_search_index
+
+        connection_created.connect(install_query_recorder, dispatch_uid='vendors_query_recorder')
+        connection_created.connect(configure_sqlite, dispatch_uid='vendors_configure_sqlite')
+        post_migrate.connect(ensure_search_index, sender=self, dispatch_uid='vendors_search_index')
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from .async_views import (
+    vendor_list, vendor_detail, purchase_order_list, purchase_order_detail,
+    vendor_historical_performance, change_feed,
+)
+
+urlpatterns = [
+    path('vendors/', vendor_list, name='async-vendors'),
+    path('vendors/<int:vendor_id>/', vendor_detail, name='async-vendor-detail'),
+    path('vendors/<int:vendor_id>/historical-performance', vendor_historical_performance,
+         name='async-vendor-historical-performance'),
+    path('purchase_orders/', purchase_order_list, name='async-purchase-orders'),
+    path('purchase_orders/<int:po_id>/', purchase_order_detail, name='async-purchase-order-detail'),
+    path('changes/', change_feed, name='async-changes'),
+]
@@ -0,0 +1,141 @@
+"""
+Native async versions of the read endpoints.
+
+These run on the event loop when the project is served through
+``vms_project.asgi`` and query with Django's async ORM instead of occupying a
+thread of the sync bridge for the whole request. Responses are byte-for-byte
+the same as those of the corresponding ``APIView`` in ``vendors.views``.
+
+Every view authenticates and checks permissions with the same
+``DEFAULT_AUTHENTICATION_CLASSES`` and ``DEFAULT_PERMISSION_CLASSES`` as the
+``APIView``, so a bad token gets the same ``401``.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .changes import ChangesExpired, await_changes, parse_change_params
+from .fastpath import FastReadSerializer, read_serializer
+from .history import history_query, serialize_history
+from .models import PurchaseOrder, Vendor
+from .renderers import FastJSONRenderer
+from .serializers import PURCHASE_ORDER_EXPANSIONS, PurchaseOrderSerializer, VendorSerializer
+from .views import parse_vendor_id
+
+renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type='application/json')
+
+
+def not_found(detail):
+    return json_response({'detail': detail}, status=404)
+
+
+@sync_to_async
+def check_access(request):
+    """Authenticate ``request`` and check permissions as ``APIView.initial`` does.
+
+    Returns the error response of a denied request, ``None`` otherwise.
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        drf_request.user
+        for permission in api_settings.DEFAULT_PERMISSION_CLASSES:
+            permission = permission()
+            if not permission.has_permission(drf_request, None):
+                if drf_request.authenticators and not drf_request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+    except exceptions.APIException as exc:
+        # Same status, header and body as APIView.handle_exception.
+        authenticate_header = None
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            if drf_request.authenticators:
+                authenticate_header = drf_request.authenticators[0].authenticate_header(drf_request)
+            if not authenticate_header:
+                exc.status_code = 403
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = json_response(data, status=exc.status_code)
+        if authenticate_header:
+            response['WWW-Authenticate'] = authenticate_header
+        return response
+    return None
+
+
+def authenticated(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        denied = await check_access(request)
+        if denied is not None:
+            return denied
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@authenticated
+async def vendor_list(request):
+    serializer = FastReadSerializer(VendorSerializer)
+    return json_response([row async for row in serializer.arows(Vendor.objects.all())])
+
+
+@authenticated
+async def vendor_detail(request, vendor_id):
+    serializer = FastReadSerializer(VendorSerializer)
+    try:
+        row = await serializer.values_list(Vendor.objects.filter(pk=vendor_id)).aget()
+    except Vendor.DoesNotExist:
+        return not_found('Vendor not found')
+    return json_response(serializer.convert(row))
+
+
+@authenticated
+async def purchase_order_list(request):
+    try:
+        vendor_id = parse_vendor_id(request.GET)
+        serializer = read_serializer(PurchaseOrderSerializer, request.GET, PURCHASE_ORDER_EXPANSIONS)
+    except ValueError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    orders = PurchaseOrder.objects.filter(vendor_id=vendor_id) if vendor_id is not None else PurchaseOrder.objects.all()
+    orders = orders.order_by('pk')
+    return json_response([row async for row in serializer.arows(orders)])
+
+
+@authenticated
+async def purchase_order_detail(request, po_id):
+    serializer = FastReadSerializer(PurchaseOrderSerializer)
+    try:
+        row = await serializer.values_list(PurchaseOrder.objects.filter(pk=po_id)).aget()
+    except PurchaseOrder.DoesNotExist:
+        return not_found('Order not found')
+    return json_response(serializer.convert(row))
+
+
+@authenticated
+async def vendor_historical_performance(request, vendor_id):
+    if not await Vendor.objects.filter(pk=vendor_id).aexists():
+        return not_found('No Vendor matches the given query.')
+    try:
+        historical_data, bucketed = history_query(vendor_id, request.GET)
+    except ValueError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    rows = [row async for row in historical_data]
+    return json_response(serialize_history(rows, bucketed))
+
+
+@authenticated
+async def change_feed(request):
+    try:
+        params = parse_change_params(request.GET)
+    except ValueError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    try:
+        page = await await_changes(**params)
+    except ChangesExpired as exc:
+        return json_response({'error': str(exc), 'next': exc.latest}, status=410)
+    return json_response(page)
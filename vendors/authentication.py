@@ -0,0 +1,131 @@
+"""
+Stateless JWT authentication.
+
+``CachedJWTAuthentication`` validates the access token (signature, expiry,
+type) in process and builds ``request.user`` from its claims as a
+``TokenUser``, instead of loading the user row on every request. The only
+state consulted is whether the user still exists, is active and (with
+``CHECK_REVOKE_TOKEN``) still has the password the token was issued for;
+that answer is kept in a bounded in-process TTL cache, so a token costs at
+most one query per user per ``IDENTITY_TTL`` seconds.
+
+``CachedRefreshToken`` adds the username and staff flags as claims for
+``TokenUser`` and keeps the result of blacklist lookups for
+``BLACKLIST_TTL`` seconds, which makes ``/api/token/refresh/`` cheap enough
+for clients to use instead of logging in again.
+
+Changes to a user evict it from the identity cache of the current process;
+other processes pick them up within ``IDENTITY_TTL``. Both caches count hits
+and misses in ``vms_auth_cache_lookups_total``.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import TTLCache
+from .instrumentation import auth_cache_lookups
+
+DEFAULTS = {
+    'IDENTITY_TTL': 60,
+    'BLACKLIST_TTL': 10,
+    'MAX_ENTRIES': 10000,
+}
+
+
+def auth_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'VMS_AUTH_CACHE', {})}
+
+
+_config = auth_cache_settings()
+identity_cache = TTLCache(_config['MAX_ENTRIES'], _config['IDENTITY_TTL'])
+blacklist_cache = TTLCache(_config['MAX_ENTRIES'], _config['BLACKLIST_TTL'])
+
+BLACKLIST_ENABLED = 'rest_framework_simplejwt.token_blacklist' in settings.INSTALLED_APPS
+if BLACKLIST_ENABLED:
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+def user_identity(user_id):
+    """Return ``(is_active, password)`` of a user, or ``None`` if it does not exist."""
+    identity = identity_cache.get(user_id)
+    if identity is not None:
+        auth_cache_lookups.inc(cache='identity', result='hit')
+        return identity
+    auth_cache_lookups.inc(cache='identity', result='miss')
+    identity = get_user_model().objects.filter(
+        **{jwt_settings.USER_ID_FIELD: user_id}
+    ).values_list('is_active', 'password').first()
+    if identity is not None:
+        identity_cache.set(user_id, identity)
+    return identity
+
+
+def is_blacklisted(jti):
+    blacklisted = blacklist_cache.get(jti)
+    if blacklisted is not None:
+        auth_cache_lookups.inc(cache='blacklist', result='hit')
+        return blacklisted
+    auth_cache_lookups.inc(cache='blacklist', result='miss')
+    blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+    blacklist_cache.set(jti, blacklisted)
+    return blacklisted
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` returning a ``TokenUser`` checked against the identity cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        identity = user_identity(user_id)
+        if identity is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        is_active, password = identity
+        if not is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return jwt_settings.TOKEN_USER_CLASS(validated_token)
+
+
+class CachedRefreshToken(RefreshToken):
+    """Refresh token carrying the ``TokenUser`` claims, with cached blacklist checks.
+
+    Access tokens derived from it copy the claims.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['username'] = user.get_username()
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        return token
+
+    if BLACKLIST_ENABLED:
+
+        def check_blacklist(self):
+            if is_blacklisted(self.payload[jwt_settings.JTI_CLAIM]):
+                raise TokenError(_('Token is blacklisted'))
+
+        def blacklist(self):
+            blacklisted = super().blacklist()
+            blacklist_cache.set(self.payload[jwt_settings.JTI_CLAIM], True)
+            return blacklisted
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def evict_user_identity(sender, instance, **kwargs):
+    identity_cache.delete(getattr(instance, jwt_settings.USER_ID_FIELD))
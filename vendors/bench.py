@@ -0,0 +1,155 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks run against a throwaway test database seeded with a synthetic,
+reproducible dataset, so they never touch the configured database.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .line_items import create_line_items
+from .metrics import rebuild_vendor_metrics
+from .models import PurchaseOrder, Vendor
+
+SEED_BATCH_SIZE = 1000
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Run the block against a freshly created (or kept) test database."""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def orders_per_vendor(vendors, orders, skew, rng):
+    """Spread about ``vendors * orders`` purchase orders with a Zipf-like skew.
+
+    ``skew=0`` gives every vendor the same number of orders; larger values
+    concentrate orders on a few hot vendors.
+    """
+    weights = [1 / (rank ** skew) for rank in range(1, vendors + 1)]
+    rng.shuffle(weights)
+    scale = vendors * orders / sum(weights)
+    return [max(1, round(weight * scale)) for weight in weights]
+
+
+def seed_dataset(vendors=200, orders=50, skew=1.0, seed=42):
+    """Create ``vendors`` vendors with purchase orders and return their ids."""
+    rng = random.Random(seed)
+    now = timezone.now().replace(microsecond=0)
+
+    Vendor.objects.bulk_create(
+        [
+            Vendor(
+                name=f'Vendor {index}',
+                contact_details=f'vendor{index}@example.com',
+                address=f'{index} Market Street',
+                vendor_code=f'BENCH-{index:06d}',
+            )
+            for index in range(vendors)
+        ],
+        batch_size=SEED_BATCH_SIZE,
+    )
+    vendor_ids = list(Vendor.objects.filter(vendor_code__startswith='BENCH-').values_list('pk', flat=True))
+
+    batch = []
+    number = 0
+    for vendor_id, count in zip(vendor_ids, orders_per_vendor(vendors, orders, skew, rng)):
+        for _ in range(count):
+            issue_date = now - timedelta(days=rng.randint(1, 365), seconds=rng.randint(0, 86399))
+            delivery_date = issue_date + timedelta(days=rng.randint(1, 30))
+            status = rng.choices(['pending', 'completed', 'canceled'], weights=[3, 6, 1])[0]
+            completed = status == 'completed'
+            acknowledged = status != 'pending' or rng.random() < 0.5
+            batch.append(PurchaseOrder(
+                po_number=f'BENCH-PO-{number:09d}',
+                vendor_id=vendor_id,
+                order_date=issue_date,
+                issue_date=issue_date,
+                delivery_date=delivery_date,
+                items=[{'sku': f'SKU-{rng.randint(1, 500):04d}', 'quantity': rng.randint(1, 20)}],
+                quantity=rng.randint(1, 100),
+                status=status,
+                quality_rating=round(rng.uniform(1, 5), 1) if completed and rng.random() < 0.8 else None,
+                acknowledgment_date=issue_date + timedelta(hours=rng.randint(1, 72)) if acknowledged else None,
+                completion_date=delivery_date + timedelta(days=rng.randint(-5, 3)) if completed else None,
+            ))
+            number += 1
+            if len(batch) >= SEED_BATCH_SIZE:
+                create_line_items(PurchaseOrder.objects.bulk_create(batch))
+                batch = []
+    if batch:
+        create_line_items(PurchaseOrder.objects.bulk_create(batch))
+
+    rebuild_vendor_metrics(vendor_ids)
+    return vendor_ids
+
+
+def timed(func, repeat):
+    """Call ``func`` ``repeat`` times and return the wall times in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(timings):
+    """p50/p95/p99/mean of a list of durations, in milliseconds."""
+    return {
+        'count': len(timings),
+        'p50_ms': percentile(timings, 0.50) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000 if timings else 0.0,
+    }
+
+
+class QueryCounter:
+    """Count the queries run on ``connection`` without enabling query logging."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def counting(self):
+        with connection.execute_wrapper(self):
+            yield self
+
+
+def measure(func, iterations):
+    """Run ``func(i)`` ``iterations`` times; return a summary with queries per call."""
+    counter = QueryCounter()
+    timings = []
+    with counter.counting():
+        for iteration in range(iterations):
+            started = time.perf_counter()
+            func(iteration)
+            timings.append(time.perf_counter() - started)
+    return {**summarize(timings), 'queries': counter.count / iterations if iterations else 0}
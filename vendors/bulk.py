@@ -0,0 +1,85 @@
+"""
+Bulk ingestion of purchase orders.
+
+Rows are validated and inserted in chunks with ``PurchaseOrderBulkSerializer``.
+Inserts bypass the per-order signals, so the metrics of every affected vendor
+are recomputed once after the whole batch instead of once per row, and the
+change feed events of each chunk are appended with one insert.
+"""
+from django.db import IntegrityError
+
+from .changes import record_changes
+from .db import write_transaction
+from .scheduler import mark_vendors_dirty
+from .serializers import PurchaseOrderBulkSerializer
+
+TRANSACTION_MODES = ('atomic', 'chunk')
+
+
+def ingest_purchase_orders(rows, mode='atomic', chunk_size=500):
+    """Create purchase orders from a list of dicts.
+
+    In ``'atomic'`` mode nothing is written unless every row is valid. In
+    ``'chunk'`` mode each chunk of ``chunk_size`` rows is committed or rejected
+    on its own. Returns a summary with the ids of the created orders (in input
+    order), the errors of the rejected rows, and the errors that rejected the
+    whole batch rather than any one row.
+    """
+    if mode not in TRANSACTION_MODES:
+        raise ValueError(f'mode must be one of {TRANSACTION_MODES}, not {mode!r}')
+
+    context = {'reserved_po_numbers': set()}
+    chunks = [(start, rows[start:start + chunk_size]) for start in range(0, len(rows), chunk_size)]
+    created = {}
+    errors = {}
+    batch_errors = []
+    affected_vendors = set()
+
+    def validate(start, chunk):
+        serializer = PurchaseOrderBulkSerializer(data=chunk, many=True, context=context)
+        if serializer.is_valid():
+            return serializer
+        for offset, row_errors in enumerate(serializer.errors):
+            if row_errors:
+                errors[start + offset] = row_errors
+        return None
+
+    def insert(start, serializer):
+        orders = serializer.save()
+        for offset, order in enumerate(orders):
+            created[start + offset] = order.pk
+            affected_vendors.add(order.vendor_id)
+        record_changes('purchase_order', 'create', [(order.pk, order.vendor_id) for order in orders])
+
+    if mode == 'atomic':
+        validated = [(start, validate(start, chunk)) for start, chunk in chunks]
+        if not errors:
+            try:
+                with write_transaction():
+                    for start, serializer in validated:
+                        insert(start, serializer)
+                    mark_vendors_dirty(affected_vendors)
+            except IntegrityError as exc:
+                created.clear()
+                batch_errors.append(f'Batch rejected: {exc}')
+    else:
+        for start, chunk in chunks:
+            serializer = validate(start, chunk)
+            if serializer is None:
+                continue
+            try:
+                with write_transaction():
+                    insert(start, serializer)
+            except IntegrityError as exc:
+                for offset in range(len(chunk)):
+                    created.pop(start + offset, None)
+                    errors[start + offset] = {'non_field_errors': [f'Chunk rejected: {exc}']}
+        mark_vendors_dirty(affected_vendors)
+
+    return {
+        'created': len(created),
+        'failed': len(rows) - len(created),
+        'ids': [created[index] for index in sorted(created)],
+        'errors': [{'index': index, 'errors': errors[index]} for index in sorted(errors)],
+        'batch_errors': batch_errors,
+    }
@@ -0,0 +1,217 @@
+"""
+Versioned response cache for the read endpoints.
+
+Every cached response belongs to one or more *scopes*:
+
+``vendor:<id>``
+    anything derived from one vendor and its purchase orders;
+``vendors``
+    the vendor list;
+``orders``
+    the unfiltered purchase order list and single purchase orders;
+``history``
+    historical performance snapshots.
+
+Each scope has a version token in the shared cache backend, replaced with a
+fresh random token whenever the underlying data changes (``bump_vendors`` /
+``bump_scopes``, called after commit). A response is keyed, and its strong
+ETag derived, from the request and the current versions of its scopes, so a
+poll of unchanged data costs one version lookup and either a ``304`` or a
+cache hit. Rendered data is kept in a bounded in-process LRU in front of the
+shared backend.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY_PREFIX = 'vms:version:'
+RESPONSE_KEY_PREFIX = 'vms:response:'
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_MAX_ENTRIES': 512,
+}
+
+
+def cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'VMS_RESPONSE_CACHE', {})}
+
+
+def shared_cache():
+    return caches[cache_settings()['CACHE_ALIAS']]
+
+
+class LRUCache:
+    """A small thread-safe LRU mapping with a fixed number of entries."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+                return self._data[key]
+            except KeyError:
+                return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TTLCache(LRUCache):
+    """An ``LRUCache`` whose entries also expire ``ttl`` seconds after being set."""
+
+    def __init__(self, max_entries, ttl):
+        super().__init__(max_entries)
+        self.ttl = ttl
+
+    def get(self, key):
+        entry = super().get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value):
+        if self.ttl > 0:
+            super().set(key, (time.monotonic() + self.ttl, value))
+
+
+local_cache = LRUCache(cache_settings()['LOCAL_MAX_ENTRIES'])
+
+
+def vendor_scope(vendor_id):
+    return f'vendor:{vendor_id}'
+
+
+def scope_versions(scopes):
+    """Return the current version token of each scope, creating missing ones."""
+    cache = shared_cache()
+    keys = [VERSION_KEY_PREFIX + scope for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = uuid.uuid4().hex
+            # Another process may have created the token in the meantime.
+            versions[key] = token if cache.add(key, token, timeout=None) else cache.get(key, token)
+    return [versions[key] for key in keys]
+
+
+def bump_scopes(scopes, using=None):
+    """Invalidate every cached response of ``scopes`` once the transaction commits."""
+    scopes = set(scopes)
+    if not scopes:
+        return
+
+    def bump():
+        shared_cache().set_many(
+            {VERSION_KEY_PREFIX + scope: uuid.uuid4().hex for scope in scopes}, timeout=None,
+        )
+
+    transaction.on_commit(bump, using=using)
+
+
+def bump_vendors(vendor_ids, using=None):
+    """Invalidate the responses affected by a change to vendors or their orders."""
+    vendor_ids = {pk for pk in vendor_ids if pk is not None}
+    if vendor_ids:
+        bump_scopes({vendor_scope(pk) for pk in vendor_ids} | {'vendors', 'orders'}, using=using)
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    if '*' in candidates:
+        return True
+    # GET uses the weak comparison, so a W/ prefix added by a proxy still matches.
+    return any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
+
+def cache_response(scopes):
+    """Decorate an ``APIView.get`` with versioned caching and conditional GET.
+
+    ``scopes`` is a callable receiving the request and URL kwargs and
+    returning the scope names the response depends on.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            config = cache_settings()
+            if not config['ENABLED']:
+                return method(view, request, *args, **kwargs)
+
+            versions = scope_versions(scopes(request, **kwargs))
+            fingerprint = hashlib.sha1('\n'.join([
+                request.path,
+                request.META.get('QUERY_STRING', ''),
+                request.accepted_media_type or '',
+                *versions,
+            ]).encode()).hexdigest()
+            etag = f'"{fingerprint}"'
+
+            if _etag_matches(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = etag
+                return response
+
+            key = RESPONSE_KEY_PREFIX + fingerprint
+            cached = local_cache.get(key)
+            if cached is None:
+                cached = shared_cache().get(key)
+                if cached is not None:
+                    local_cache.set(key, cached)
+
+            if cached is not None:
+                kind, payload, content_type = cached
+                if kind == 'data':
+                    response = Response(payload)
+                else:
+                    response = HttpResponse(payload, content_type=content_type)
+            else:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK or response.streaming:
+                    return response
+                if isinstance(response, Response):
+                    cached = ('data', response.data, None)
+                else:
+                    cached = ('content', response.content, response['Content-Type'])
+                local_cache.set(key, cached)
+                shared_cache().set(key, cached, timeout=config['TIMEOUT'])
+
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
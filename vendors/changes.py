@@ -0,0 +1,246 @@
+"""
+Append-only change feed of vendors and purchase orders.
+
+Every create, update and delete of a vendor or purchase order appends a
+``ChangeEvent`` in the same transaction as the write. Single writes are
+recorded by the model signal receivers. The set-based paths that bypass them
+(``vendors.bulk`` and ``vendors.transitions``) record their own events, and
+writes of the metric columns in ``vendors.metrics`` record vendor events. An
+event names the object and its vendor, not the object's new state. Clients
+refetch only what changed instead of re-downloading whole lists.
+
+The event's auto-incremented id is its sequence number. SQLite serializes
+writers, so events become visible in sequence order and a reader that resumes
+after the last sequence number it saw never skips one.
+
+``compact_changes`` truncates the events below a watermark set by
+``VMS_CHANGE_FEED``: events older than ``RETENTION`` seconds, and all but the
+newest ``MAX_EVENTS``, are dropped, but the newest event is always kept.
+Compaction runs after every ``COMPACT_EVERY`` events and from ``manage.py
+compact_changes``. A reader resuming from below the watermark gets
+``ChangesExpired`` and must resync from the lists.
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+KINDS = tuple(kind for kind, _ in ChangeEvent.KIND_CHOICES)
+EVENT_FIELDS = ('pk', 'kind', 'action', 'object_id', 'vendor_id', 'recorded_at')
+COMPACT_BATCH_SIZE = 10000
+# How often an async waiter checks for events committed by this process.
+LOCAL_CHECK_INTERVAL = 0.05
+
+DEFAULTS = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 1000,
+    'MAX_WAIT': 30,
+    'POLL_INTERVAL': 1.0,
+    'RETENTION': 7 * 24 * 3600,
+    'MAX_EVENTS': 1000000,
+    'COMPACT_EVERY': 10000,
+}
+
+# Bumped after every commit that recorded events, waking this process's waiters.
+_committed = threading.Condition()
+_generation = 0
+
+
+class ChangesExpired(Exception):
+    """Events after the requested sequence number were compacted away.
+
+    ``latest`` is the end of the log: a client reloads the lists and resumes
+    from there.
+    """
+
+    def __init__(self, since, latest):
+        super().__init__(f'Changes after {since} are no longer available; reload the lists and resume from "next"')
+        self.latest = latest
+
+
+def change_feed_settings():
+    return {**DEFAULTS, **getattr(settings, 'VMS_CHANGE_FEED', {})}
+
+
+def record_changes(kind, action, objects, using=None):
+    """Append one event per ``(object_id, vendor_id)`` pair of ``objects``."""
+    events = ChangeEvent.objects.using(using).bulk_create([
+        ChangeEvent(kind=kind, action=action, object_id=object_id, vendor_id=vendor_id)
+        for object_id, vendor_id in objects
+    ])
+    if not events:
+        return
+    every = change_feed_settings()['COMPACT_EVERY']
+    first, last = events[0].pk, events[-1].pk
+    compact = every and first is not None and (first - 1) // every != last // every
+    transaction.on_commit(lambda: _on_commit(compact), using=using)
+
+
+def _on_commit(compact):
+    global _generation
+    with _committed:
+        _generation += 1
+        _committed.notify_all()
+    if compact:
+        try:
+            compact_changes()
+        except Exception:
+            logger.exception('Compacting the change feed failed')
+
+
+def _non_negative_int(params, name):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValueError(f'{name} must be a non-negative integer')
+    return value
+
+
+def parse_change_params(params):
+    """Parse ``?since=&limit=&wait=&vendor_id=&kind=`` into ``wait_for_changes`` arguments.
+
+    Raises ``ValueError`` with a client-facing message on invalid input.
+    """
+    config = change_feed_settings()
+    limit = _non_negative_int(params, 'limit')
+    if limit == 0:
+        raise ValueError('limit must be a positive integer')
+    try:
+        wait = float(params.get('wait') or 0)
+    except ValueError:
+        wait = -1.0
+    if not 0 <= wait < float('inf'):
+        raise ValueError('wait must be a non-negative number of seconds')
+    kind = params.get('kind') or None
+    if kind is not None and kind not in KINDS:
+        raise ValueError(f'kind must be one of: {", ".join(KINDS)}')
+    return {
+        'since': _non_negative_int(params, 'since'),
+        'limit': min(limit or config['PAGE_SIZE'], config['MAX_PAGE_SIZE']),
+        'timeout': min(wait, config['MAX_WAIT']),
+        'vendor_id': _non_negative_int(params, 'vendor_id'),
+        'kind': kind,
+    }
+
+
+def latest_sequence():
+    """Sequence number of the newest event, 0 for an empty log."""
+    return ChangeEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def _event(row):
+    seq, kind, action, object_id, vendor_id, recorded_at = row
+    return {
+        'seq': seq, 'kind': kind, 'action': action, 'id': object_id,
+        'vendor_id': vendor_id, 'recorded_at': recorded_at,
+    }
+
+
+def read_changes(since=None, limit=None, vendor_id=None, kind=None):
+    """Return the events after sequence number ``since``, oldest first.
+
+    Returns ``{'events', 'next', 'has_more'}``. ``next`` is the ``since`` of
+    the following read, past any events the filters skipped. Without
+    ``since`` no events are returned and ``next`` is the end of the log.
+    Raises ``ChangesExpired`` if events after ``since`` were compacted.
+    """
+    limit = limit or change_feed_settings()['PAGE_SIZE']
+    latest = latest_sequence()
+    if since is None:
+        return {'events': [], 'next': latest, 'has_more': False}
+    oldest = ChangeEvent.objects.order_by('pk').values_list('pk', flat=True).first()
+    if oldest is not None and since < oldest - 1:
+        raise ChangesExpired(since, latest)
+
+    events = ChangeEvent.objects.filter(pk__gt=since, pk__lte=latest)
+    if vendor_id is not None:
+        events = events.filter(vendor_id=vendor_id)
+    if kind is not None:
+        events = events.filter(kind=kind)
+    rows = list(events.order_by('pk').values_list(*EVENT_FIELDS)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'events': [_event(row) for row in rows],
+        'next': rows[-1][0] if has_more else max(latest, since),
+        'has_more': has_more,
+    }
+
+
+def wait_for_changes(since=None, timeout=0, **filters):
+    """``read_changes``, waiting up to ``timeout`` seconds for an event to arrive.
+
+    Events committed by this process wake the waiter immediately, those of
+    other processes are noticed within ``POLL_INTERVAL`` seconds.
+    """
+    poll_interval = change_feed_settings()['POLL_INTERVAL']
+    deadline = time.monotonic() + timeout
+    while True:
+        generation = _generation
+        page = read_changes(since, **filters)
+        remaining = deadline - time.monotonic()
+        if page['events'] or remaining <= 0:
+            return page
+        since = page['next']
+        with _committed:
+            _committed.wait_for(lambda: _generation != generation, timeout=min(remaining, poll_interval))
+
+
+async def await_changes(since=None, timeout=0, **filters):
+    """Async ``wait_for_changes``, which waits without holding a thread."""
+    poll_interval = change_feed_settings()['POLL_INTERVAL']
+    deadline = time.monotonic() + timeout
+    read = sync_to_async(read_changes)
+    while True:
+        generation = _generation
+        page = await read(since, **filters)
+        remaining = deadline - time.monotonic()
+        if page['events'] or remaining <= 0:
+            return page
+        since = page['next']
+        poll_at = time.monotonic() + min(remaining, poll_interval)
+        while _generation == generation and time.monotonic() < poll_at:
+            await asyncio.sleep(min(LOCAL_CHECK_INTERVAL, max(poll_at - time.monotonic(), 0)))
+
+
+def compaction_watermark(now=None):
+    """Sequence number of the oldest event to keep, ``None`` for an empty log."""
+    config = change_feed_settings()
+    latest = latest_sequence()
+    if not latest:
+        return None
+    cutoff = (now or timezone.now()) - timedelta(seconds=config['RETENTION'])
+    # Events are recorded in time order, so the first recent one bounds the old ones.
+    first_recent = (
+        ChangeEvent.objects.filter(recorded_at__gte=cutoff).order_by('pk').values_list('pk', flat=True).first()
+    )
+    watermark = max(first_recent or latest, latest - config['MAX_EVENTS'] + 1)
+    return min(watermark, latest)
+
+
+def compact_changes(now=None, batch_size=COMPACT_BATCH_SIZE):
+    """Delete every event below the retention watermark. Returns the number deleted."""
+    watermark = compaction_watermark(now)
+    oldest = ChangeEvent.objects.order_by('pk').values_list('pk', flat=True).first()
+    deleted = 0
+    while watermark is not None and oldest is not None and oldest < watermark:
+        # Short range deletes, so writers appending events are never held up for long.
+        upper = min(oldest + batch_size, watermark)
+        deleted += ChangeEvent.objects.filter(pk__lt=upper).delete()[0]
+        oldest = upper
+    return deleted
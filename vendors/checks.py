@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core import checks
+
+from .cache import cache_settings
+
+# Backends whose entries are only visible to the process that wrote them.
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_response_cache_backend(app_configs, **kwargs):
+    """The response cache's version tokens must be shared by every worker process."""
+    config = cache_settings()
+    if not config['ENABLED']:
+        return []
+    backend = settings.CACHES.get(config['CACHE_ALIAS'], {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [checks.Error(
+        f'VMS_RESPONSE_CACHE is enabled, but its cache alias {config["CACHE_ALIAS"]!r} uses {backend}, '
+        'which is local to one process.',
+        hint=(
+            'A write would only invalidate the cached responses and ETags of its own process; other '
+            'workers would keep serving stale data. Point the alias at a shared backend (Redis, '
+            'Memcached) or set VMS_RESPONSE_CACHE["ENABLED"] to False.'
+        ),
+        id='vendors.E001',
+    )]
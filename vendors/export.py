@@ -0,0 +1,69 @@
+"""
+Streaming exports of the vendor and purchase order lists.
+
+Rows are read with a chunked ``values_list()`` iterator, converted by the
+fast read path and flushed in batches, so memory stays flat regardless of the
+table size and the first rows reach the client immediately.
+"""
+import csv
+import io
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .fastpath import FastReadSerializer
+from .renderers import CSVRenderer, NDJSONRenderer, csv_value
+
+EXPORT_FORMATS = (NDJSONRenderer.format, CSVRenderer.format)
+
+ROWS_PER_FLUSH = 200
+
+
+def _serialized_rows(queryset, reader):
+    chunk_size = getattr(settings, 'VMS_EXPORT_CHUNK_SIZE', 2000)
+    return reader.rows(queryset.order_by('pk'), chunk_size=chunk_size)
+
+
+def _ndjson_lines(rows):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(row))
+        if len(batch) >= ROWS_PER_FLUSH:
+            yield '\n'.join(batch) + '\n'
+            batch = []
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+
+def _csv_lines(rows, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([csv_value(row.get(field)) for field in header])
+        if count % ROWS_PER_FLUSH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_export(queryset, serializer_class, export_format, filename, reader=None):
+    """Return a ``StreamingHttpResponse`` exporting ``queryset`` as NDJSON or CSV.
+
+    ``reader`` is the ``FastReadSerializer`` to use, e.g. one restricted to
+    some fields; by default every field of ``serializer_class`` is exported.
+    """
+    reader = reader or FastReadSerializer(serializer_class)
+    rows = _serialized_rows(queryset, reader)
+    if export_format == NDJSONRenderer.format:
+        response = StreamingHttpResponse(_ndjson_lines(rows), content_type='application/x-ndjson; charset=utf-8')
+    elif export_format == CSVRenderer.format:
+        header = reader.names
+        response = StreamingHttpResponse(_csv_lines(rows, header), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    else:
+        raise ValueError(f'Unsupported export format {export_format!r}')
+    return response
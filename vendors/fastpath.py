@@ -0,0 +1,170 @@
+"""
+Fast read path for the list endpoints.
+
+``FastReadSerializer`` inspects a ``ModelSerializer`` once and compiles a
+converter per readable field. Rows are then fetched with ``values_list()`` and
+turned into dicts without instantiating models or walking DRF field objects,
+producing exactly what ``serializer_class(queryset, many=True).data`` would.
+Fields without a dedicated converter fall back to their own
+``to_representation``.
+
+``fields`` restricts the output, and the selected columns, to some fields.
+``expand`` embeds the object behind a related field, read through a join in
+the same query (``vendor__name``, ...) rather than one request per object.
+``read_serializer()`` builds both from the ``?fields=`` and ``?expand=``
+query parameters.
+"""
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+
+def _identity(value):
+    return value
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601 or not settings.USE_TZ:
+        return field.to_representation
+    field_timezone = getattr(field, 'timezone', None) or field.default_timezone()
+
+    def convert(value):
+        if isinstance(value, str):
+            return value
+        if value.tzinfo is not None and value.utcoffset() is not None:
+            value = value.astimezone(field_timezone)
+        else:
+            value = field.enforce_timezone(value)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+CONVERTERS = {
+    serializers.IntegerField: lambda field: int,
+    serializers.FloatField: lambda field: float,
+    serializers.CharField: lambda field: str,
+    serializers.ChoiceField: lambda field: _identity,
+    serializers.JSONField: lambda field: _identity if not field.binary else field.to_representation,
+    serializers.PrimaryKeyRelatedField: lambda field: _identity,
+    serializers.DateTimeField: _datetime_converter,
+}
+
+
+def _names(raw):
+    return [name for name in (part.strip() for part in (raw or '').split(',')) if name]
+
+
+def read_serializer(serializer_class, params, expansions=None):
+    """Build a ``FastReadSerializer`` from ``?fields=a,b`` and ``?expand=vendor``.
+
+    ``expansions`` maps the fields that may be expanded to the serializer of
+    the embedded object. Raises ``ValueError`` with a client-facing message on
+    unknown names.
+    """
+    expansions = expansions or {}
+    expand = _names(params.get('expand'))
+    unknown = [name for name in expand if name not in expansions]
+    if unknown:
+        raise ValueError(
+            f'Cannot expand: {", ".join(unknown)}. Expandable fields: {", ".join(expansions) or "none"}'
+        )
+    return FastReadSerializer(
+        serializer_class, fields=_names(params.get('fields')) or None, expand={name: expansions[name] for name in expand},
+    )
+
+
+class FastReadSerializer:
+    """Serialize querysets for ``serializer_class`` straight from ``values_list()`` rows."""
+
+    def __init__(self, serializer_class, fields=None, expand=None):
+        model = serializer_class.Meta.model
+        expand = expand or {}
+        readable = {name: field for name, field in serializer_class().fields.items() if not field.write_only}
+        unknown = [name for name in (fields or ()) if name not in readable]
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}. Available fields: {", ".join(readable)}')
+
+        self.names = []
+        self.columns = []
+        self.converters = []
+        # (name, number of columns, converter) per output field, in order.
+        self.layout = []
+        for name, field in readable.items():
+            if fields is not None and name not in fields and name not in expand:
+                continue
+            if name in expand:
+                if not isinstance(field, serializers.PrimaryKeyRelatedField):
+                    raise ValueError(f'{name} cannot be expanded')
+                related = FastReadSerializer(expand[name])
+                self.names.append(name)
+                self.columns.extend(f'{field.source}__{column}' for column in related.columns)
+                self.converters.append(related.convert)
+                self.layout.append((name, len(related.columns), related.convert))
+                continue
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                column = model._meta.get_field(field.source).attname
+            else:
+                column = field.source
+            converter = CONVERTERS.get(type(field), lambda field: field.to_representation)(field)
+            self.names.append(name)
+            self.columns.append(column)
+            self.converters.append(converter)
+            self.layout.append((name, 1, converter))
+        self.expanded = len(self.columns) != len(self.names)
+
+    def values_list(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def values(self, queryset, *extra):
+        """``values()`` rows for consumers that read columns by name, such as
+        the cursor paginator reading ``id``; ``extra`` columns are selected but
+        not output."""
+        return queryset.values(*dict.fromkeys([*self.columns, *extra]))
+
+    def convert(self, row):
+        """Turn one ``values_list()`` tuple into an output dict."""
+        if self.expanded:
+            return self._convert_expanded(row)
+        return {
+            name: None if value is None else convert(value)
+            for name, convert, value in zip(self.names, self.converters, row)
+        }
+
+    def _convert_expanded(self, row):
+        output = {}
+        position = 0
+        for name, width, convert in self.layout:
+            if width == 1:
+                value = row[position]
+                output[name] = None if value is None else convert(value)
+            else:
+                values = row[position:position + width]
+                output[name] = None if all(value is None for value in values) else convert(values)
+            position += width
+        return output
+
+    def convert_values(self, row):
+        """Turn one ``values()`` dict into an output dict."""
+        return self.convert(tuple(row[column] for column in self.columns))
+
+    def rows(self, queryset, chunk_size=None):
+        """Yield one output dict per row of ``queryset``."""
+        values = self.values_list(queryset)
+        if chunk_size:
+            values = values.iterator(chunk_size=chunk_size)
+        convert = self.convert
+        for row in values:
+            yield convert(row)
+
+    async def arows(self, queryset):
+        """Async counterpart of ``rows()`` built on ``async for``."""
+        convert = self.convert
+        async for row in self.values_list(queryset):
+            yield convert(row)
+
+    def data(self, queryset):
+        return list(self.rows(queryset))
@@ -0,0 +1,102 @@
+"""
+Query building for the historical performance endpoints.
+
+Shared by the synchronous API view and its async counterpart so both accept
+the same ``from``/``to``/``bucket``/``limit`` parameters and return the same
+shape.
+"""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import HistoricalPerformance
+
+METRIC_FIELDS = ('on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate')
+
+BUCKETS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def parse_moment(value, end_of_day=False):
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def history_query(vendor_id, params):
+    """Return ``(queryset, bucketed)`` for the request parameters ``params``.
+
+    The queryset yields value dicts, most recent first, so the limit keeps the
+    latest history. Raises ``ValueError`` with a client-facing message on
+    invalid parameters.
+    """
+    historical_data = HistoricalPerformance.objects.filter(vendor_id=vendor_id)
+
+    try:
+        if 'from' in params:
+            historical_data = historical_data.filter(date__gte=parse_moment(params['from']))
+        if 'to' in params:
+            historical_data = historical_data.filter(date__lte=parse_moment(params['to'], end_of_day=True))
+    except ValueError as exc:
+        raise ValueError(f'Invalid date: {exc}')
+
+    try:
+        limit = int(params.get('limit', settings.VMS_HISTORY_MAX_POINTS))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    limit = min(limit, settings.VMS_HISTORY_MAX_POINTS)
+
+    bucket = params.get('bucket')
+    if bucket is None:
+        return historical_data.order_by('-date').values('date', *METRIC_FIELDS)[:limit], False
+
+    if bucket not in BUCKETS:
+        raise ValueError(f'bucket must be one of: {", ".join(BUCKETS)}')
+
+    aggregates = {'samples': Count('id')}
+    for field in METRIC_FIELDS:
+        aggregates[f'{field}__min'] = Min(field)
+        aggregates[f'{field}__max'] = Max(field)
+        aggregates[f'{field}__avg'] = Avg(field)
+    buckets = (
+        historical_data.annotate(bucket=BUCKETS[bucket]('date'))
+        .values('bucket').annotate(**aggregates).order_by('-bucket')[:limit]
+    )
+    return buckets, True
+
+
+def serialize_history(rows, bucketed):
+    """Turn the rows of ``history_query`` into the response list, oldest first."""
+    rows = list(rows)
+    rows.reverse()
+    if not bucketed:
+        return rows
+
+    serialized_data = []
+    for row in rows:
+        serialized_record = {'date': row['bucket'], 'samples': row['samples']}
+        for field in METRIC_FIELDS:
+            serialized_record[field] = {
+                'min': row[f'{field}__min'],
+                'max': row[f'{field}__max'],
+                'avg': row[f'{field}__avg'],
+            }
+        serialized_data.append(serialized_record)
+    return serialized_data
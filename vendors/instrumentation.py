@@ -0,0 +1,196 @@
+"""
+In-process request instrumentation.
+
+``RequestMetricsMiddleware`` collects wall time, database time and query count
+per request, plus the time spent in the purchase order signal handlers
+(wrapped with ``timed_signal_handler``). Observations are kept in lock-protected
+histograms and counters rendered in the Prometheus text format by the
+``/api/_metrics`` endpoint. Everything is plain arithmetic on a few floats, so
+it is cheap enough to leave on.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from functools import wraps
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'signal_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.signal_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Called by record_query() for every query of the request.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+current_request_stats = contextvars.ContextVar('vms_request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection, see ``install_query_recorder``.
+
+    Queries are attributed through a context variable rather than a
+    per-request wrapper, because the async ORM runs queries on a connection
+    owned by a ``sync_to_async`` thread, which still sees the request's context.
+    """
+    stats = current_request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``record_query`` to new connections."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        label_names = self.labels + ('le',)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', _format_labels(label_names, key + (bound,)), cumulative
+            yield f'{self.name}_sum', _format_labels(self.labels, key), total
+            yield f'{self.name}_count', _format_labels(self.labels, key), count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    'vms_http_request_duration_seconds', 'Wall time spent handling a request.',
+    labels=('view', 'method', 'status'),
+))
+request_db_duration = registry.register(Histogram(
+    'vms_http_request_db_seconds', 'Time spent executing database queries per request.',
+    labels=('view', 'method'),
+))
+request_queries = registry.register(Histogram(
+    'vms_http_request_queries', 'Database queries executed per request.',
+    labels=('view', 'method'), buckets=QUERY_BUCKETS,
+))
+request_signal_duration = registry.register(Histogram(
+    'vms_http_request_signal_seconds', 'Time spent in purchase order signal handlers per request.',
+    labels=('view', 'method'),
+))
+signal_handler_duration = registry.register(Histogram(
+    'vms_signal_handler_duration_seconds', 'Duration of individual signal handler calls.',
+    labels=('handler',),
+))
+auth_cache_lookups = registry.register(Counter(
+    'vms_auth_cache_lookups_total', 'Authentication cache lookups by cache and result (hit or miss).',
+    labels=('cache', 'result'),
+))
+
+
+def timed_signal_handler(handler):
+    """Record a signal receiver's duration globally and on the current request."""
+    name = handler.__name__
+
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            signal_handler_duration.observe(elapsed, handler=name)
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.signal_time += elapsed
+    return wrapper
@@ -0,0 +1,130 @@
+"""
+Line-item index derived from ``PurchaseOrder.items``.
+
+``items`` is free-form JSON. Every entry that names a SKU becomes one
+``PurchaseOrderItem`` row carrying the order's vendor and order date, so SKU
+lookups and per-vendor SKU totals are indexed SQL instead of JSON decoding.
+Supported shapes are a list of objects with ``sku`` and an optional
+``quantity`` (default 1), and an object mapping SKUs to quantities. Entries
+without a SKU, and non-numeric quantities, are ignored.
+
+The rows are rewritten when an order's items, vendor or order date change
+(see the ``PurchaseOrder`` receivers), by the bulk ingest, and in bulk by
+``manage.py backfill_line_items``.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .models import PurchaseOrder, PurchaseOrderItem
+
+BACKFILL_BATCH_SIZE = 1000
+MAX_SKU_LENGTH = PurchaseOrderItem._meta.get_field('sku').max_length
+
+
+def _quantity(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def line_items(items):
+    """Return ``(sku, quantity)`` pairs for the entries of an ``items`` value."""
+    if isinstance(items, dict):
+        entries = [{'sku': sku, 'quantity': quantity} for sku, quantity in items.items()]
+    elif isinstance(items, list):
+        entries = items
+    else:
+        return []
+
+    lines = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        sku = entry.get('sku')
+        if isinstance(sku, (int, float)) and not isinstance(sku, bool):
+            sku = str(sku)
+        if not isinstance(sku, str) or not sku.strip():
+            continue
+        quantity = _quantity(entry.get('quantity', 1))
+        if quantity is None:
+            continue
+        lines.append((sku.strip()[:MAX_SKU_LENGTH], quantity))
+    return lines
+
+
+def line_item_rows(order_id, vendor_id, order_date, items):
+    return [
+        PurchaseOrderItem(
+            purchase_order_id=order_id, vendor_id=vendor_id, order_date=order_date,
+            position=position, sku=sku, quantity=quantity,
+        )
+        for position, (sku, quantity) in enumerate(line_items(items))
+    ]
+
+
+def create_line_items(orders):
+    """Insert the line items of freshly created ``orders``."""
+    PurchaseOrderItem.objects.bulk_create(
+        [row for order in orders for row in line_item_rows(order.pk, order.vendor_id, order.order_date, order.items)],
+        batch_size=BACKFILL_BATCH_SIZE,
+    )
+
+
+def sync_line_items(order):
+    """Replace the line items of one saved ``order``."""
+    with transaction.atomic():
+        PurchaseOrderItem.objects.filter(purchase_order_id=order.pk).delete()
+        create_line_items([order])
+
+
+def backfill_line_items(batch_size=BACKFILL_BATCH_SIZE):
+    """Rebuild the line items of every purchase order. Returns ``(orders, items)``."""
+    orders = written = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            PurchaseOrder.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'vendor_id', 'order_date', 'items')[:batch_size]
+        )
+        if not batch:
+            return orders, written
+        rows = [row for values in batch for row in line_item_rows(*values)]
+        with transaction.atomic():
+            PurchaseOrderItem.objects.filter(purchase_order_id__gt=last_pk, purchase_order_id__lte=batch[-1][0]).delete()
+            PurchaseOrderItem.objects.bulk_create(rows)
+        orders += len(batch)
+        written += len(rows)
+        last_pk = batch[-1][0]
+
+
+def orders_with_sku(sku, vendor_id=None):
+    """Purchase orders with at least one line of ``sku``."""
+    lines = PurchaseOrderItem.objects.filter(sku=sku)
+    if vendor_id is not None:
+        lines = lines.filter(vendor_id=vendor_id)
+    return PurchaseOrder.objects.filter(pk__in=lines.values('purchase_order_id')).order_by('pk')
+
+
+def sku_vendor_totals(sku, start=None, end=None):
+    """Per-vendor orders, lines and quantity of ``sku``, ordered by quantity."""
+    lines = PurchaseOrderItem.objects.filter(sku=sku)
+    if start is not None:
+        lines = lines.filter(order_date__gte=start)
+    if end is not None:
+        lines = lines.filter(order_date__lte=end)
+    return lines.values('vendor_id').annotate(
+        orders=Count('purchase_order_id', distinct=True),
+        lines=Count('id'),
+        quantity=Sum('quantity'),
+        first_order=Min('order_date'),
+        last_order=Max('order_date'),
+    ).order_by('-quantity', 'vendor_id')
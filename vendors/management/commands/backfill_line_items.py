@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from vendors.line_items import BACKFILL_BATCH_SIZE, backfill_line_items
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the PurchaseOrderItem line-item index from the items of every purchase order.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        orders, items = backfill_line_items(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {items} line item(s) of {orders} purchase order(s).'))
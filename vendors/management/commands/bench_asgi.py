@@ -0,0 +1,79 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from vendors.bench import benchmark_database, seed_dataset, summarize
+from vendors.models import PurchaseOrder
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/second of the same read endpoints served through the WSGI and the ASGI '
+        'handler at high concurrency, for both the sync APIViews (/api/) and the native async '
+        'views (/api/async/).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=20, help='Average purchase orders per vendor.')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=64)
+
+    def handle(self, *args, **options):
+        # Measure the request path itself, not the response cache.
+        with benchmark_database(), override_settings(VMS_RESPONSE_CACHE={'ENABLED': False}):
+            vendor_ids = seed_dataset(options['vendors'], options['orders'])
+            order_ids = list(PurchaseOrder.objects.values_list('pk', flat=True))
+            rng = random.Random(0)
+            paths = []
+            for _ in range(options['requests']):
+                paths.append(rng.choice([
+                    f'/vendors/{rng.choice(vendor_ids)}/',
+                    f'/purchase_orders/{rng.choice(order_ids)}/',
+                    f'/purchase_orders/?vendor_id={rng.choice(vendor_ids)}',
+                ]))
+
+            # Each view set runs under both handlers, so the server is the only difference.
+            for views, prefix in (('sync views', '/api'), ('async views', '/api/async')):
+                for server, runner in (('WSGI', self.run_wsgi), ('ASGI', self.run_asgi)):
+                    started = time.perf_counter()
+                    latencies = runner([prefix + path for path in paths], options['concurrency'])
+                    elapsed = time.perf_counter() - started
+                    summary = summarize(latencies)
+                    self.stdout.write(
+                        f'{views:<11} {server}: {len(paths) / elapsed:8.0f} req/s  '
+                        f'p50 {summary["p50_ms"]:7.2f} ms  p95 {summary["p95_ms"]:7.2f} ms  '
+                        f'p99 {summary["p99_ms"]:7.2f} ms  (concurrency {options["concurrency"]})'
+                    )
+
+    def run_wsgi(self, paths, concurrency):
+        def fetch(path):
+            started = time.perf_counter()
+            response = Client().get(path)
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(fetch, paths))
+
+    def run_asgi(self, paths, concurrency):
+        async def main():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch(path):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        raise CommandError(f'{path} returned {response.status_code}')
+                    return time.perf_counter() - started
+
+            return await asyncio.gather(*(fetch(path) for path in paths))
+
+        return asyncio.run(main())
@@ -0,0 +1,138 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+
+from vendors.bench import seed_dataset, summarize
+from vendors.models import PurchaseOrder
+
+PROFILES = ('default', 'production')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure mixed read/write API throughput against a file-backed SQLite database under '
+        'each database profile (VMS_DB_PROFILE), with concurrent reader and writer threads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--vendors', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=20, help='Average purchase orders per vendor.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per profile.')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Fraction of operations that write.')
+        parser.add_argument('--worker', action='store_true', help=(
+            'Run the load in this process against the configured database (used internally).'
+        ))
+
+    def handle(self, *args, **options):
+        if not 0 <= options['write_ratio'] <= 1:
+            raise CommandError('--write-ratio must be between 0 and 1')
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_worker(options)))
+            return
+
+        # Each profile runs in a fresh process, since the profile decides the
+        # DATABASES setting, and against its own temporary database file.
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as directory:
+                env = {
+                    **os.environ,
+                    'VMS_DB_PROFILE': profile,
+                    'VMS_DB_NAME': os.path.join(directory, 'bench.sqlite3'),
+                }
+                env.pop('VMS_DB_REPLICA_NAME', None)
+                completed = subprocess.run(
+                    [sys.executable, '-m', 'django', 'bench_db', '--worker',
+                     '--vendors', str(options['vendors']), '--orders', str(options['orders']),
+                     '--threads', str(options['threads']), '--duration', str(options['duration']),
+                     '--write-ratio', str(options['write_ratio'])],
+                    cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+                )
+            if completed.returncode:
+                raise CommandError(f'{profile} run failed:\n{completed.stderr}')
+            self.print_result(profile, json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    def print_result(self, profile, result):
+        self.stdout.write(
+            f'{profile:<11} {result["ops_per_second"]:8.0f} ops/s  '
+            f'read p50 {result["read"]["p50_ms"]:7.2f} ms p99 {result["read"]["p99_ms"]:8.2f} ms  '
+            f'write p50 {result["write"]["p50_ms"]:7.2f} ms p99 {result["write"]["p99_ms"]:8.2f} ms  '
+            f'errors {result["errors"]}'
+        )
+
+    def run_worker(self, options):
+        call_command('migrate', verbosity=0)
+        with override_settings(VMS_RESPONSE_CACHE={'ENABLED': False}):
+            vendor_ids = seed_dataset(options['vendors'], options['orders'])
+            order_ids = list(PurchaseOrder.objects.values_list('pk', flat=True))
+            connections.close_all()
+
+            timings = {'read': [], 'write': []}
+            errors = []
+            lock = threading.Lock()
+            deadline = time.perf_counter() + options['duration']
+
+            def run(seed):
+                rng = random.Random(seed)
+                # Not under setup_test_environment(), so 'testserver' is no allowed host.
+                client = Client(SERVER_NAME='localhost')
+                local = {'read': [], 'write': []}
+                failures = 0
+                try:
+                    while time.perf_counter() < deadline:
+                        kind = 'write' if rng.random() < options['write_ratio'] else 'read'
+                        started = time.perf_counter()
+                        try:
+                            if kind == 'write':
+                                response = client.put(
+                                    f'/api/purchase_orders/{rng.choice(order_ids)}/',
+                                    {'status': rng.choice(['pending', 'completed']), 'quality_rating': rng.randint(1, 5)},
+                                    content_type='application/json',
+                                )
+                            else:
+                                response = client.get(rng.choice([
+                                    f'/api/vendors/{rng.choice(vendor_ids)}/',
+                                    f'/api/purchase_orders/?vendor_id={rng.choice(vendor_ids)}',
+                                    '/api/vendors/top/?k=20',
+                                ]))
+                            ok = response.status_code == 200
+                        except Exception:
+                            # e.g. "database is locked" once the busy timeout runs out.
+                            ok = False
+                        if ok:
+                            local[kind].append(time.perf_counter() - started)
+                        else:
+                            failures += 1
+                finally:
+                    connections.close_all()
+                with lock:
+                    timings['read'].extend(local['read'])
+                    timings['write'].extend(local['write'])
+                    errors.append(failures)
+
+            threads = [threading.Thread(target=run, args=(seed,)) for seed in range(options['threads'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        return {
+            'ops_per_second': (len(timings['read']) + len(timings['write'])) / elapsed,
+            'read': summarize(timings['read']),
+            'write': summarize(timings['write']),
+            'errors': sum(errors),
+        }
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from vendors.analytics import analytics_available, analytics_report
+from vendors.bench import benchmark_database, seed_dataset
+from vendors.fastpath import FastReadSerializer
+from vendors.models import PurchaseOrder, Vendor
+from vendors.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from vendors.serializers import PurchaseOrderSerializer, VendorSerializer
+
+
+def cpu_time(func, repeat):
+    """Call ``func`` ``repeat`` times and return the best CPU time of one call in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        func()
+        timings.append(time.process_time() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare CPU time per response and bytes on the wire (raw and gzipped) of the JSON, '
+        'orjson and MessagePack renderers on typical payloads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=40, help='Average purchase orders per vendor.')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        renderers = [('json', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', FastJSONRenderer()))
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+
+        with benchmark_database():
+            seed_dataset(options['vendors'], options['orders'])
+            orders = FastReadSerializer(PurchaseOrderSerializer)
+            payloads = [
+                ('po_list_page', orders.data(PurchaseOrder.objects.order_by('pk')[:options['page_size']])),
+                ('po_list_all', orders.data(PurchaseOrder.objects.order_by('pk'))),
+                ('vendor_list_all', FastReadSerializer(VendorSerializer).data(Vendor.objects.order_by('pk'))),
+            ]
+            if analytics_available():
+                payloads.append(('analytics_report', analytics_report(refresh=True)))
+
+            for label, data in payloads:
+                self.compare(label, data, renderers, options['repeat'])
+
+    def compare(self, label, data, renderers, repeat):
+        baseline = JSONRenderer().render(data)
+        self.stdout.write(f'{label}:')
+        for name, renderer in renderers:
+            content = renderer.render(data)
+            if name == 'orjson' and content != baseline:
+                raise CommandError(f'{label}: FastJSONRenderer output differs from JSONRenderer')
+            seconds = cpu_time(lambda: renderer.render(data), repeat)
+            compressed = compress_string(content)
+            gzip_seconds = cpu_time(lambda: compress_string(content), repeat)
+            self.stdout.write(
+                f'  {name:<8} {seconds * 1000:>9.3f} ms CPU  {len(content):>10,} bytes  '
+                f'gzip {len(compressed):>9,} bytes (+{gzip_seconds * 1000:.3f} ms CPU)'
+            )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from vendors.bench import benchmark_database, seed_dataset, timed
+from vendors.fastpath import FastReadSerializer
+from vendors.models import PurchaseOrder, Vendor
+from vendors.serializers import PurchaseOrderSerializer, VendorSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/second of the DRF list serializers with the fast values_list() read path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=40, help='Average purchase orders per vendor.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            seed_dataset(options['vendors'], options['orders'])
+            for label, queryset, serializer_class in (
+                ('vendors', Vendor.objects.all(), VendorSerializer),
+                ('purchase_orders', PurchaseOrder.objects.all(), PurchaseOrderSerializer),
+            ):
+                self.compare(label, queryset, serializer_class, options['repeat'])
+
+    def compare(self, label, queryset, serializer_class, repeat):
+        renderer = JSONRenderer()
+        drf = renderer.render(serializer_class(queryset.all(), many=True).data)
+        fast = renderer.render(FastReadSerializer(serializer_class).data(queryset.all()))
+        if drf != fast:
+            raise CommandError(f'{label}: fast path output differs from {serializer_class.__name__}')
+
+        rows = queryset.count()
+        drf_time = min(timed(lambda: serializer_class(queryset.all(), many=True).data, repeat))
+        fast_time = min(timed(lambda: FastReadSerializer(serializer_class).data(queryset.all()), repeat))
+        self.stdout.write(
+            f'{label}: {rows} rows, identical JSON ({len(drf)} bytes)\n'
+            f'  {serializer_class.__name__:<24} {rows / drf_time:>12,.0f} rows/s\n'
+            f'  {"FastReadSerializer":<24} {rows / fast_time:>12,.0f} rows/s  ({drf_time / fast_time:.1f}x)'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from vendors.changes import COMPACT_BATCH_SIZE, compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Truncate the change feed below its retention watermark (VMS_CHANGE_FEED RETENTION and MAX_EVENTS).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=COMPACT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = compact_changes(batch_size=options['batch_size'])
+        self.stdout.write(f'Deleted {deleted} change event(s).')
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from vendors.scheduler import DRAIN_BATCH_SIZE, process_metric_jobs
+
+
+class Command(BaseCommand):
+    help = 'Recount the metrics of vendors queued in MetricRecomputeJob (VMS_METRICS_MODE = "queue").'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DRAIN_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_metric_jobs(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Recomputed metrics for {processed} vendor(s).')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
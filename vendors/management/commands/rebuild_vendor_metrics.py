@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from vendors.metrics import rebuild_vendor_metrics
+
+
+class Command(BaseCommand):
+    help = 'Recount the running metric totals of vendors from their purchase orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('vendor_ids', nargs='*', type=int, help='Vendors to rebuild (default: all).')
+
+    def handle(self, *args, **options):
+        written = rebuild_vendor_metrics(options['vendor_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt metrics for {written} vendor(s).'))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from vendors.models import Vendor
+from vendors.search import install_search_index, search_supported
+
+
+class Command(BaseCommand):
+    help = 'Recreate the vendor full-text search triggers if missing and repopulate the index from all vendors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not search_supported(connection):
+            raise CommandError(f'Full-text search requires SQLite, {options["database"]} uses {connection.vendor}.')
+        started = time.perf_counter()
+        install_search_index(connection, rebuild=True)
+        elapsed = time.perf_counter() - started
+        count = Vendor.objects.using(options['database']).count()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} vendor(s) in {elapsed:.2f}s.'))
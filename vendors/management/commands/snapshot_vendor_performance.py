@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from vendors.snapshots import SNAPSHOT_BUCKETS, next_bucket_start, snapshot_vendor_performance
+
+
+class Command(BaseCommand):
+    help = 'Record a HistoricalPerformance snapshot of every vendor for the current hour or day.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bucket', choices=sorted(SNAPSHOT_BUCKETS),
+            default=getattr(settings, 'VMS_SNAPSHOT_BUCKET', 'day'),
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and take a snapshot at the start of every bucket.',
+        )
+
+    def handle(self, *args, **options):
+        bucket = options['bucket']
+        while True:
+            started = time.monotonic()
+            written = snapshot_vendor_performance(bucket)
+            self.stdout.write(self.style.SUCCESS(
+                f'Snapshotted {written} vendor(s) in {time.monotonic() - started:.2f}s.'
+            ))
+            if not options['loop']:
+                return
+            now = timezone.now()
+            time.sleep((next_bucket_start(now, bucket) - now).total_seconds())
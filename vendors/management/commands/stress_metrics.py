@@ -0,0 +1,205 @@
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, OperationalError, close_old_connections
+from django.utils import timezone
+
+from vendors.bench import seed_dataset
+from vendors.metrics import COUNTER_FIELDS, recount, vendor_values
+from vendors.models import PurchaseOrder, Vendor, VendorMetrics
+
+PROFILES = ('default', 'production')
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer purchase order saves for a few hot vendors from several processes against a '
+        'file-backed SQLite database, report throughput and check that the vendor metrics '
+        'equal a full recount afterwards. Exits non-zero if any write failed with a lock error '
+        'or the metrics differ.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=PROFILES, default='production')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--vendors', type=int, default=3, help='Hot vendors receiving every write.')
+        parser.add_argument('--orders', type=int, default=30, help='Purchase orders per hot vendor.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load.')
+        parser.add_argument('--stage', choices=('setup', 'worker', 'verify'), help=(
+            'Run one stage in this process against the configured database (used internally).'
+        ))
+        parser.add_argument('--retries', type=int, default=0, help=(
+            'Retry a write failing with "database is locked" up to this many times. Off by default, '
+            'so every lock error counts as a failure.'
+        ))
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['stage']:
+            result = getattr(self, f'run_{options["stage"]}')(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'VMS_DB_PROFILE': options['profile'],
+                'VMS_DB_NAME': os.path.join(directory, 'stress.sqlite3'),
+            }
+            env.pop('VMS_DB_REPLICA_NAME', None)
+            self.run_stage('setup', options, env)
+            workers = [
+                subprocess.Popen(
+                    self.stage_command('worker', options, seed), cwd=settings.BASE_DIR, env=env,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                )
+                for seed in range(options['processes'])
+            ]
+            results = []
+            for worker in workers:
+                stdout, stderr = worker.communicate()
+                if worker.returncode:
+                    raise CommandError(f'Worker failed:\n{stderr}')
+                results.append(json.loads(stdout.strip().splitlines()[-1]))
+            verification = self.run_stage('verify', options, env)
+
+        totals = {key: sum(result[key] for result in results) for key in ('writes', 'missing', 'retries', 'failures')}
+        elapsed = max(result['elapsed'] for result in results)
+        self.stdout.write(
+            f'{options["profile"]}: {totals["writes"]} writes from {options["processes"]} processes in '
+            f'{elapsed:.1f} s ({totals["writes"] / elapsed:.0f} writes/s), {totals["missing"]} skipped for '
+            f'orders deleted by another process, {totals["failures"]} failed with a lock error'
+        )
+        if options['retries']:
+            self.stdout.write(
+                f'Lock errors were retried up to {options["retries"]} times per write (--retries): '
+                f'{totals["retries"]} retries.'
+            )
+        if verification['mismatches']:
+            raise CommandError(
+                f'{len(verification["mismatches"])} of {verification["vendors"]} vendors differ from a recount: '
+                f'{json.dumps(verification["mismatches"][:5], default=str)}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Metrics of all {verification["vendors"]} vendors match a recount.'))
+        if totals['failures']:
+            raise CommandError(f'{totals["failures"]} writes failed with "database is locked".')
+
+    def stage_command(self, stage, options, seed=0):
+        return [
+            sys.executable, '-m', 'django', 'stress_metrics', '--stage', stage, '--seed', str(seed),
+            '--vendors', str(options['vendors']), '--orders', str(options['orders']),
+            '--duration', str(options['duration']), '--retries', str(options['retries']),
+        ]
+
+    def run_stage(self, stage, options, env):
+        completed = subprocess.run(
+            self.stage_command(stage, options), cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f'{stage} failed:\n{completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def run_setup(self, options):
+        call_command('migrate', verbosity=0)
+        return seed_dataset(options['vendors'], options['orders'], skew=0)
+
+    def run_worker(self, options):
+        rng = random.Random(options['seed'])
+        vendor_ids = list(Vendor.objects.values_list('pk', flat=True))
+        order_ids = list(PurchaseOrder.objects.values_list('pk', flat=True))
+        writes = missing = retries = failures = created = 0
+        started = time.perf_counter()
+        deadline = started + options['duration']
+        while time.perf_counter() < deadline:
+            action = rng.choices(['update', 'create', 'delete'], weights=[90, 7, 3])[0]
+            for attempt in range(options['retries'] + 1):
+                try:
+                    if action == 'create':
+                        order_ids.append(self.create_order(rng, vendor_ids, f'STRESS-{options["seed"]}-{created}'))
+                        created += 1
+                    elif action == 'delete':
+                        PurchaseOrder.objects.get(pk=rng.choice(order_ids)).delete()
+                    else:
+                        self.update_order(rng, vendor_ids, rng.choice(order_ids))
+                    writes += 1
+                    break
+                except PurchaseOrder.DoesNotExist:
+                    # Deleted by another process.
+                    missing += 1
+                    break
+                except OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    # The transaction was rolled back.
+                    close_old_connections()
+                    if attempt == options['retries']:
+                        failures += 1
+                    else:
+                        retries += 1
+                        time.sleep(rng.uniform(0, 0.01) * (attempt + 1))
+        return {
+            'writes': writes,
+            'missing': missing,
+            'retries': retries,
+            'failures': failures,
+            'elapsed': time.perf_counter() - started,
+        }
+
+    def create_order(self, rng, vendor_ids, po_number):
+        now = timezone.now()
+        return PurchaseOrder.objects.create(
+            po_number=po_number, vendor_id=rng.choice(vendor_ids), order_date=now,
+            delivery_date=now + timedelta(days=rng.randint(-3, 3)), items=[{'sku': 'STRESS', 'quantity': 1}],
+            quantity=1, status=rng.choice(['pending', 'completed']), issue_date=now,
+        ).pk
+
+    def update_order(self, rng, vendor_ids, order_id):
+        # Load outside of a transaction, as a view does, so the saves race.
+        order = PurchaseOrder.objects.get(pk=order_id)
+        change = rng.choice(['status', 'rating', 'acknowledge', 'delivery', 'vendor'])
+        if change == 'status':
+            order.status = rng.choice(['pending', 'completed', 'canceled'])
+        elif change == 'rating':
+            order.quality_rating = rng.choice([None, 1.0, 2.5, 4.0, 5.0])
+        elif change == 'acknowledge':
+            order.acknowledgment_date = None if order.acknowledgment_date else timezone.now()
+        elif change == 'delivery':
+            order.delivery_date = timezone.now() + timedelta(hours=rng.randint(-72, 72))
+        else:
+            order.vendor_id = rng.choice(vendor_ids)
+        try:
+            order.save(force_update=True)
+        except DatabaseError as exc:
+            if 'did not affect any rows' not in str(exc):
+                raise
+            raise PurchaseOrder.DoesNotExist(f'Order {order_id} was deleted') from exc
+
+    def run_verify(self, options):
+        expected = recount()
+        empty = dict.fromkeys(COUNTER_FIELDS, 0)
+        stored = {row['vendor_id']: row for row in VendorMetrics.objects.values('vendor_id', *COUNTER_FIELDS)}
+        mismatches = []
+        vendors = Vendor.objects.all()
+        for vendor in vendors:
+            counters = expected.get(vendor.pk, empty)
+            actual = {field: stored.get(vendor.pk, {}).get(field) for field in COUNTER_FIELDS}
+            values = vendor_values(counters)
+            if not all(
+                actual[field] is not None and math.isclose(actual[field], counters[field], rel_tol=1e-9, abs_tol=1e-6)
+                for field in COUNTER_FIELDS
+            ) or not all(
+                math.isclose(getattr(vendor, field), value, rel_tol=1e-9, abs_tol=1e-9)
+                for field, value in values.items()
+            ):
+                mismatches.append({'vendor': vendor.pk, 'stored': actual, 'recount': counters})
+        return {'vendors': len(vendors), 'mismatches': mismatches}
@@ -0,0 +1,189 @@
+import json
+import platform
+import random
+import sys
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.db.models import Count
+from django.utils import timezone
+
+from vendors.bench import benchmark_database, measure, seed_dataset
+from vendors.models import PurchaseOrder
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic dataset in a throwaway database, time every API endpoint and raw '
+        'PurchaseOrder.save() signal overhead, and write p50/p95/p99 and queries per operation as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=50, help='Average purchase orders per vendor.')
+        parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent of orders per vendor (0 = uniform).')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--only', nargs='*', help='Run only these operations.')
+        parser.add_argument('--with-cache', action='store_true', help='Leave the response cache enabled.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', help='Previous results JSON to diff against.')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Percent p50 slowdown reported as a regression by --compare.')
+
+    def handle(self, *args, **options):
+        cache_settings = {} if options['with_cache'] else {'VMS_RESPONSE_CACHE': {'ENABLED': False}}
+        with benchmark_database(), override_settings(**cache_settings):
+            vendor_ids = seed_dataset(options['vendors'], options['orders'], options['skew'], options['seed'])
+            results = self.run_operations(vendor_ids, options)
+
+        report = {
+            'meta': {
+                'vendors': options['vendors'],
+                'orders_per_vendor': options['orders'],
+                'skew': options['skew'],
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'response_cache': options['with_cache'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': sys.platform,
+                'created': timezone.now().isoformat(),
+            },
+            'results': results,
+        }
+
+        self.print_results(results)
+        if options['output']:
+            with open(options['output'], 'w') as fp:
+                json.dump(report, fp, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def operations(self, vendor_ids):
+        client = Client()
+        rng = random.Random(0)
+        now = timezone.now()
+        hot_vendor = (
+            PurchaseOrder.objects.values('vendor_id').annotate(orders=Count('id')).order_by('-orders')[0]['vendor_id']
+        )
+        order_ids = list(PurchaseOrder.objects.values_list('pk', flat=True))
+        pending_ids = list(
+            PurchaseOrder.objects.filter(acknowledgment_date__isnull=True).values_list('pk', flat=True)
+        )
+        rng.shuffle(pending_ids)
+
+        def order_payload(tag, iteration, vendor_id):
+            return {
+                'po_number': f'{tag}-{iteration}',
+                'vendor': vendor_id,
+                'order_date': now.isoformat(),
+                'issue_date': now.isoformat(),
+                'delivery_date': (now + timedelta(days=7)).isoformat(),
+                'items': [{'sku': 'SKU-0001', 'quantity': 1}],
+                'quantity': 1,
+                'status': 'pending',
+            }
+
+        def expect(response, *codes):
+            if response.status_code not in codes:
+                raise CommandError(f'{response.request["PATH_INFO"]} returned {response.status_code}')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+
+        def save_order(iteration):
+            order = PurchaseOrder.objects.get(pk=order_ids[iteration % len(order_ids)])
+            order.status = 'completed' if order.status != 'completed' else 'pending'
+            order.quality_rating = 4.0
+            order.save()
+
+        return {
+            'vendor_list': lambda i: expect(client.get('/api/vendors/'), 200),
+            'vendor_list_page': lambda i: expect(client.get('/api/vendors/?page_size=100'), 200),
+            'vendor_search': lambda i: expect(client.get(f'/api/vendors/?q=vendor {i}'), 200),
+            'vendor_top': lambda i: expect(client.get('/api/vendors/top/?k=20'), 200),
+            'vendor_top_weighted': lambda i: expect(client.get('/api/vendors/top/?k=20&weights=quality:1,on_time:1'), 200),
+            'vendor_detail': lambda i: expect(client.get(f'/api/vendors/{rng.choice(vendor_ids)}/'), 200),
+            'vendor_create': lambda i: expect(client.post('/api/vendors/', {
+                'name': f'New {i}', 'contact_details': 'c', 'address': 'a', 'vendor_code': f'NEW-{i}',
+            }, content_type='application/json'), 201),
+            'vendor_update': lambda i: expect(client.put(
+                f'/api/vendors/{rng.choice(vendor_ids)}/', {'address': f'{i} Main Street'},
+                content_type='application/json'), 200),
+            'po_list': lambda i: expect(client.get('/api/purchase_orders/'), 200),
+            'po_list_vendor': lambda i: expect(client.get(f'/api/purchase_orders/?vendor_id={hot_vendor}'), 200),
+            'changes_vendor': lambda i: expect(client.get(f'/api/changes/?since=0&limit=100&vendor_id={hot_vendor}'), 200),
+            'po_list_page': lambda i: expect(client.get('/api/purchase_orders/?page_size=100'), 200),
+            'po_list_page_sparse': lambda i: expect(client.get(
+                '/api/purchase_orders/?page_size=100&fields=id,po_number,status,delivery_date'), 200),
+            'po_list_page_expand': lambda i: expect(client.get('/api/purchase_orders/?page_size=100&expand=vendor'), 200),
+            'po_export_ndjson': lambda i: expect(client.get('/api/purchase_orders/?format=ndjson'), 200),
+            'sku_orders': lambda i: expect(client.get(f'/api/skus/SKU-{i % 500 + 1:04d}/purchase_orders/'), 200),
+            'sku_vendor_totals': lambda i: expect(client.get(f'/api/skus/SKU-{i % 500 + 1:04d}/vendors/'), 200),
+            'analytics_report': lambda i: expect(client.get('/api/analytics/?refresh=1'), 200, 503),
+            'po_detail': lambda i: expect(client.get(f'/api/purchase_orders/{rng.choice(order_ids)}/'), 200),
+            'po_create': lambda i: expect(client.post(
+                '/api/purchase_orders/', order_payload('BENCH-NEW', i, rng.choice(vendor_ids)),
+                content_type='application/json'), 201),
+            'po_bulk_100': lambda i: expect(client.post(
+                '/api/purchase_orders/bulk/',
+                [order_payload(f'BENCH-BULK-{i}', row, rng.choice(vendor_ids)) for row in range(100)],
+                content_type='application/json'), 201),
+            'po_update_status': lambda i: expect(client.put(
+                f'/api/purchase_orders/{rng.choice(order_ids)}/',
+                {'status': rng.choice(['pending', 'completed', 'canceled'])},
+                content_type='application/json'), 200),
+            'po_acknowledge': lambda i: expect(client.post(
+                f'/api/api/purchase_orders/{pending_ids[i % len(pending_ids)]}/acknowledge'), 200, 400),
+            'po_transition_100': lambda i: expect(client.post('/api/purchase_orders/transition/', {
+                'action': 'acknowledge', 'ids': pending_ids[i * 100 % len(pending_ids):][:100],
+            }, content_type='application/json'), 200, 207, 400),
+            'vendor_history': lambda i: expect(client.get(
+                f'/api/api/vendors/{rng.choice(vendor_ids)}/historical-performance'), 200),
+            'signal_po_save': save_order,
+        }
+
+    def run_operations(self, vendor_ids, options):
+        operations = self.operations(vendor_ids)
+        selected = options['only'] or list(operations)
+        unknown = set(selected) - set(operations)
+        if unknown:
+            raise CommandError(f'Unknown operations: {", ".join(sorted(unknown))}')
+
+        results = {}
+        for name in selected:
+            results[name] = measure(operations[name], options['iterations'])
+        return results
+
+    def print_results(self, results):
+        self.stdout.write(f'{"operation":<20} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<20} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                f'{result["p99_ms"]:>9.2f} {result["queries"]:>8.1f}'
+            )
+
+    def compare(self, results, path, threshold):
+        with open(path) as fp:
+            baseline = json.load(fp)['results']
+        self.stdout.write(f'\nCompared with {path}:')
+        regressions = 0
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+            flag = ''
+            if change > threshold or result['queries'] > before['queries']:
+                flag = '  REGRESSION'
+                regressions += 1
+            self.stdout.write(
+                f'{name:<20} p50 {before["p50_ms"]:>8.2f} -> {result["p50_ms"]:>8.2f} ms ({change:+6.1f}%)  '
+                f'queries {before["queries"]:>5.1f} -> {result["queries"]:>5.1f}{flag}'
+            )
+        if regressions:
+            self.stdout.write(self.style.WARNING(f'{regressions} regression(s) above {threshold}%'))
@@ -0,0 +1,226 @@
+"""
+Incremental maintenance of the vendor performance metrics.
+
+Each purchase order contributes a fixed set of counters to its vendor's
+``VendorMetrics`` row. Saving or deleting an order applies the difference
+between the old and the new contribution with a single ``UPDATE``, and the
+metric columns on ``Vendor`` are derived from those counters. A full recount
+(``rebuild_vendor_metrics``) produces exactly the same counters and is used to
+seed vendors that have no ``VendorMetrics`` row yet.
+
+The ``Vendor`` metric columns are recomputed from the counters in SQL, in the
+same ``UPDATE`` that writes them, so concurrent writers never write back
+values derived from a stale read of the counters.
+
+A write that changes a vendor's metric columns records a vendor ``update``
+event in the change feed, in the same transaction.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast
+
+from .changes import record_changes
+from .db import write_transaction
+from .models import PurchaseOrder, Vendor, VendorMetrics
+from .ranking import performance_score, performance_score_expression
+
+COUNTER_FIELDS = (
+    'total_orders',
+    'completed_orders',
+    'on_time_orders',
+    'rated_orders',
+    'quality_rating_sum',
+    'acknowledged_orders',
+    'response_time_sum',
+)
+
+METRIC_FIELDS = (
+    'on_time_delivery_rate',
+    'quality_rating_avg',
+    'average_response_time',
+    'fulfillment_rate',
+)
+
+# Columns written on ``Vendor`` whenever its metrics change.
+VENDOR_FIELDS = METRIC_FIELDS + ('performance_score',)
+
+# The (numerator, denominator) counters each metric column is derived from.
+METRIC_INPUTS = {
+    'on_time_delivery_rate': ('on_time_orders', 'completed_orders'),
+    'quality_rating_avg': ('quality_rating_sum', 'rated_orders'),
+    'average_response_time': ('response_time_sum', 'acknowledged_orders'),
+    'fulfillment_rate': ('completed_orders', 'total_orders'),
+}
+
+REBUILD_BATCH_SIZE = 500
+
+
+def order_contribution(status, delivery_date, completion_date, quality_rating, issue_date, acknowledgment_date, **extra):
+    """Return the counters a single purchase order adds to its vendor."""
+    completed = status == 'completed'
+    rated = completed and quality_rating is not None
+    acknowledged = acknowledgment_date is not None
+    on_time = completed and completion_date is not None and completion_date <= delivery_date
+    return {
+        'total_orders': 1,
+        'completed_orders': int(completed),
+        'on_time_orders': int(on_time),
+        'rated_orders': int(rated),
+        'quality_rating_sum': float(quality_rating) if rated else 0.0,
+        'acknowledged_orders': int(acknowledged),
+        'response_time_sum': (acknowledgment_date - issue_date).total_seconds() if acknowledged else 0.0,
+    }
+
+
+def metric_values(counters):
+    """Derive the ``Vendor`` metric columns from a set of counters.
+
+    Rates are fractions between 0 and 1 and the average response time is
+    expressed in seconds.
+    """
+    completed = counters['completed_orders']
+    rated = counters['rated_orders']
+    acknowledged = counters['acknowledged_orders']
+    total = counters['total_orders']
+    return {
+        'on_time_delivery_rate': counters['on_time_orders'] / completed if completed else 0.0,
+        'quality_rating_avg': counters['quality_rating_sum'] / rated if rated else 0.0,
+        'average_response_time': counters['response_time_sum'] / acknowledged if acknowledged else 0.0,
+        'fulfillment_rate': completed / total if total else 0.0,
+    }
+
+
+def vendor_values(counters):
+    """``metric_values`` plus the ``performance_score`` derived from them."""
+    values = metric_values(counters)
+    values['performance_score'] = performance_score(values)
+    return values
+
+
+def _ratio(numerator, denominator):
+    return Case(
+        When(**{f'{denominator}__gt': 0}, then=Cast(numerator, FloatField()) / F(denominator)),
+        default=Value(0.0), output_field=FloatField(),
+    )
+
+
+def vendor_expressions():
+    """SQL counterpart of ``vendor_values`` over the ``VendorMetrics`` columns."""
+    expressions = {field: _ratio(*inputs) for field, inputs in METRIC_INPUTS.items()}
+    expressions['performance_score'] = performance_score_expression(
+        {field: _ratio(*inputs) for field, inputs in METRIC_INPUTS.items()}
+    )
+    return expressions
+
+
+def vendor_updates(fields=VENDOR_FIELDS):
+    """``Vendor`` update values recomputing ``fields`` from each vendor's counters."""
+    expressions = vendor_expressions()
+    counters = VendorMetrics.objects.filter(pk=OuterRef('pk'))
+    return {field: Subquery(counters.values(value=expressions[field])) for field in fields}
+
+
+def apply_order_change(previous, current):
+    """Move a vendor's counters from an order's old state to its new one.
+
+    ``previous`` and ``current`` are ``(vendor_id, contribution)`` pairs, or
+    ``None`` when the order did not exist before (create) or no longer exists
+    (delete). An order that moved between vendors is subtracted from one and
+    added to the other.
+    """
+    deltas = {}
+    for sign, state in ((-1, previous), (1, current)):
+        if state is None:
+            continue
+        vendor_id, contribution = state
+        delta = deltas.setdefault(vendor_id, dict.fromkeys(COUNTER_FIELDS, 0))
+        for field, value in contribution.items():
+            delta[field] += sign * value
+
+    for vendor_id, delta in deltas.items():
+        if any(delta.values()):
+            apply_delta(vendor_id, delta)
+
+
+def apply_delta(vendor_id, delta):
+    changes = {field: F(field) + value for field, value in delta.items() if value}
+    with transaction.atomic():
+        if not VendorMetrics.objects.filter(pk=vendor_id).update(**changes):
+            # No running totals for this vendor yet: seed them from a recount,
+            # which already reflects the change being applied.
+            rebuild_vendor_metrics([vendor_id])
+            return
+        # Only rewrite the metric columns derived from the counters that moved.
+        fields = [field for field, inputs in METRIC_INPUTS.items() if any(delta.get(name) for name in inputs)]
+        fields.append('performance_score')
+        stored = Vendor.objects.filter(pk=vendor_id).values_list(*fields)
+        before = stored.first()
+        Vendor.objects.filter(pk=vendor_id).update(**vendor_updates(fields))
+        if stored.first() != before:
+            record_changes('vendor', 'update', [(vendor_id, vendor_id)])
+
+
+def recount_queryset(vendor_ids=None):
+    """Grouped aggregate producing the counters for every vendor with orders."""
+    orders = PurchaseOrder.objects.all()
+    if vendor_ids is not None:
+        orders = orders.filter(vendor_id__in=vendor_ids)
+    completed = Q(status='completed')
+    acknowledged = Q(acknowledgment_date__isnull=False)
+    return orders.order_by().values('vendor_id').annotate(
+        total_orders=Count('id'),
+        completed_orders=Count('id', filter=completed),
+        on_time_orders=Count('id', filter=completed & Q(completion_date__lte=F('delivery_date'))),
+        rated_orders=Count('id', filter=completed & Q(quality_rating__isnull=False)),
+        quality_rating_sum=Sum('quality_rating', filter=completed),
+        acknowledged_orders=Count('id', filter=acknowledged),
+        response_time_sum=Sum(F('acknowledgment_date') - F('issue_date'), filter=acknowledged),
+    )
+
+
+def recount(vendor_ids=None):
+    """Return ``{vendor_id: counters}`` computed from scratch."""
+    counters = {}
+    for row in recount_queryset(vendor_ids):
+        response_time_sum = row['response_time_sum']
+        counters[row['vendor_id']] = {
+            'total_orders': row['total_orders'],
+            'completed_orders': row['completed_orders'],
+            'on_time_orders': row['on_time_orders'],
+            'rated_orders': row['rated_orders'],
+            'quality_rating_sum': row['quality_rating_sum'] or 0.0,
+            'acknowledged_orders': row['acknowledged_orders'],
+            'response_time_sum': response_time_sum.total_seconds() if response_time_sum else 0.0,
+        }
+    return counters
+
+
+def rebuild_vendor_metrics(vendor_ids=None):
+    """Recount the counters and metric columns for the given vendors.
+
+    With ``vendor_ids=None`` every vendor is rebuilt. Returns the number of
+    vendors written.
+    """
+    vendors = Vendor.objects.order_by('pk')
+    if vendor_ids is not None:
+        # Skip vendors deleted since they were scheduled for a rebuild.
+        vendors = vendors.filter(pk__in=list(vendor_ids))
+    vendor_ids = list(vendors.values_list('pk', flat=True))
+
+    written = 0
+    for start in range(0, len(vendor_ids), REBUILD_BATCH_SIZE):
+        batch = vendor_ids[start:start + REBUILD_BATCH_SIZE]
+        counters = recount(batch)
+        empty = dict.fromkeys(COUNTER_FIELDS, 0)
+        metrics = [VendorMetrics(vendor_id=pk, **counters.get(pk, empty)) for pk in batch]
+        stored = Vendor.objects.filter(pk__in=batch).values_list('pk', *VENDOR_FIELDS)
+        with write_transaction():
+            before = set(stored.all())
+            VendorMetrics.objects.bulk_create(
+                metrics, update_conflicts=True, unique_fields=['vendor'], update_fields=COUNTER_FIELDS,
+            )
+            Vendor.objects.filter(pk__in=batch).update(**vendor_updates())
+            changed = sorted(pk for pk, *values in set(stored.all()) - before)
+            record_changes('vendor', 'update', [(pk, pk) for pk in changed])
+        written += len(batch)
+    return written
@@ -0,0 +1,111 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from .db import read_only
+from .instrumentation import (
+    RequestStats, current_request_stats, request_db_duration, request_duration,
+    request_queries, request_signal_duration,
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures wall time, database time, query count and signal handler time of
+    each request, adds them as a ``Server-Timing`` header and records them in
+    the histograms served at ``/api/_metrics``.
+
+    Supports both sync and async request handling, so it does not force async
+    views back onto the sync bridge under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    def record(self, request, response, stats, elapsed):
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+        method = request.method
+        request_duration.observe(elapsed, view=view, method=method, status=response.status_code)
+        request_db_duration.observe(stats.db_time, view=view, method=method)
+        request_queries.observe(stats.queries, view=view, method=method)
+        request_signal_duration.observe(stats.signal_time, view=view, method=method)
+
+        response['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.2f}, '
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+            f'signals;dur={stats.signal_time * 1000:.2f}'
+        )
+        return response
+
+
+class ReadOnlyRoutingMiddleware:
+    """
+    Handles GET, HEAD and OPTIONS requests inside ``vendors.db.read_only()``,
+    so ``ReadReplicaRouter`` serves their queries from the replica connection.
+    """
+    sync_capable = True
+    async_capable = True
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method not in self.SAFE_METHODS:
+            return self.get_response(request)
+        with read_only():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method not in self.SAFE_METHODS:
+            return await self.get_response(request)
+        with read_only():
+            return await self.get_response(request)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    ``GZipMiddleware`` that leaves responses shorter than
+    ``VMS_GZIP_MIN_LENGTH`` bytes uncompressed, since compressing small
+    bodies costs more CPU than it saves on the wire. Streamed responses
+    (exports) have no known length and are always compressed.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < getattr(settings, 'VMS_GZIP_MIN_LENGTH', 1024):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,106 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of the vendors.metrics helpers as of this migration, so that
+# later changes to them do not change what it does.
+COUNTER_FIELDS = (
+    'total_orders', 'completed_orders', 'on_time_orders', 'rated_orders', 'quality_rating_sum',
+    'acknowledged_orders', 'response_time_sum',
+)
+METRIC_FIELDS = ('on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate')
+
+
+def order_contribution(status, delivery_date, completion_date, quality_rating, issue_date, acknowledgment_date, **extra):
+    completed = status == 'completed'
+    rated = completed and quality_rating is not None
+    acknowledged = acknowledgment_date is not None
+    on_time = completed and completion_date is not None and completion_date <= delivery_date
+    return {
+        'total_orders': 1,
+        'completed_orders': int(completed),
+        'on_time_orders': int(on_time),
+        'rated_orders': int(rated),
+        'quality_rating_sum': float(quality_rating) if rated else 0.0,
+        'acknowledged_orders': int(acknowledged),
+        'response_time_sum': (acknowledgment_date - issue_date).total_seconds() if acknowledged else 0.0,
+    }
+
+
+def metric_values(counters):
+    completed = counters['completed_orders']
+    rated = counters['rated_orders']
+    acknowledged = counters['acknowledged_orders']
+    total = counters['total_orders']
+    return {
+        'on_time_delivery_rate': counters['on_time_orders'] / completed if completed else 0.0,
+        'quality_rating_avg': counters['quality_rating_sum'] / rated if rated else 0.0,
+        'average_response_time': counters['response_time_sum'] / acknowledged if acknowledged else 0.0,
+        'fulfillment_rate': completed / total if total else 0.0,
+    }
+
+
+def backfill_metrics(apps, schema_editor):
+    """Stamp completed orders and seed every vendor's counters and metric columns.
+
+    The moment existing orders were completed was never recorded. Their
+    ``delivery_date`` stands in for it, so they count as delivered on time,
+    which is what the previous rule reported for most of them.
+    """
+    Vendor = apps.get_model('vendors', 'Vendor')
+    VendorMetrics = apps.get_model('vendors', 'VendorMetrics')
+    PurchaseOrder = apps.get_model('vendors', 'PurchaseOrder')
+    PurchaseOrder.objects.filter(status='completed', completion_date__isnull=True).update(
+        completion_date=models.F('delivery_date'),
+    )
+
+    counters = {}
+    orders = PurchaseOrder.objects.values(
+        'vendor_id', 'status', 'delivery_date', 'completion_date', 'quality_rating', 'issue_date',
+        'acknowledgment_date',
+    )
+    for order in orders.iterator(chunk_size=2000):
+        totals = counters.setdefault(order['vendor_id'], dict.fromkeys(COUNTER_FIELDS, 0))
+        for field, value in order_contribution(**order).items():
+            totals[field] += value
+
+    empty = dict.fromkeys(COUNTER_FIELDS, 0)
+    vendors = list(Vendor.objects.only('pk'))
+    VendorMetrics.objects.bulk_create(
+        [VendorMetrics(vendor_id=vendor.pk, **counters.get(vendor.pk, empty)) for vendor in vendors], batch_size=500,
+    )
+    for vendor in vendors:
+        for field, value in metric_values(counters.get(vendor.pk, empty)).items():
+            setattr(vendor, field, value)
+    Vendor.objects.bulk_update(vendors, METRIC_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0002_historicalperformance_purchaseorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorMetrics',
+            fields=[
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='metrics', serialize=False, to='vendors.vendor')),
+                ('total_orders', models.PositiveIntegerField(default=0)),
+                ('completed_orders', models.PositiveIntegerField(default=0)),
+                ('on_time_orders', models.PositiveIntegerField(default=0)),
+                ('rated_orders', models.PositiveIntegerField(default=0)),
+                ('quality_rating_sum', models.FloatField(default=0.0)),
+                ('acknowledged_orders', models.PositiveIntegerField(default=0)),
+                ('response_time_sum', models.FloatField(default=0.0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='completion_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_metrics, migrations.RunPython.noop),
+    ]
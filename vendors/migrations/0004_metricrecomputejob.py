@@ -0,0 +1,22 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0003_vendormetrics_purchaseorder_completion_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRecomputeJob',
+            fields=[
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='vendors.vendor')),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
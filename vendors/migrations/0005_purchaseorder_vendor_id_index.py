@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0004_metricrecomputejob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['vendor', 'id'], name='po_vendor_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0005_purchaseorder_vendor_id_index'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='historicalperformance',
+            constraint=models.UniqueConstraint(fields=('vendor', 'date'), name='unique_vendor_snapshot'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.4 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0006_historicalperformance_unique_vendor_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['vendor', 'status', 'delivery_date'], name='po_vendor_status_delivery_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('quality_rating__isnull', False)), fields=['vendor', 'status', 'quality_rating'], name='po_vendor_rated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('acknowledgment_date__isnull', False)), fields=['vendor', 'acknowledgment_date', 'issue_date'], name='po_vendor_acknowledged_idx'),
+        ),
+    ]
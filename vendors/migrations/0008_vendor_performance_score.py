@@ -0,0 +1,60 @@
+# Generated by Django 5.0.4 on 2026-10-18 18:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of the vendors.ranking score as of this migration, so that later
+# changes to it do not change what it does.
+SCORE_FIELDS = ('on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate')
+DEFAULT_WEIGHTS = {
+    'on_time_delivery_rate': 0.35,
+    'quality_rating_avg': 0.35,
+    'average_response_time': 0.1,
+    'fulfillment_rate': 0.2,
+}
+MAX_QUALITY_RATING = 5.0
+RESPONSE_TIME_SCALE = 86400.0
+
+
+def performance_score(values, weights):
+    response_time = values['average_response_time']
+    components = {
+        'on_time_delivery_rate': values['on_time_delivery_rate'],
+        'quality_rating_avg': values['quality_rating_avg'] / MAX_QUALITY_RATING,
+        'average_response_time': RESPONSE_TIME_SCALE / (RESPONSE_TIME_SCALE + response_time) if response_time > 0 else 0.0,
+        'fulfillment_rate': values['fulfillment_rate'],
+    }
+    return sum(weights[field] * components[field] for field in SCORE_FIELDS)
+
+
+def compute_scores(apps, schema_editor):
+    # The stored score follows the configured weights, as the live code does.
+    weights = getattr(settings, 'VMS_SCORE_WEIGHTS', DEFAULT_WEIGHTS)
+    total = sum(weights.values())
+    weights = {field: weights.get(field, 0.0) / total for field in SCORE_FIELDS}
+
+    Vendor = apps.get_model('vendors', 'Vendor')
+    vendors = list(Vendor.objects.only(*SCORE_FIELDS))
+    for vendor in vendors:
+        vendor.performance_score = performance_score({field: getattr(vendor, field) for field in SCORE_FIELDS}, weights)
+    Vendor.objects.bulk_update(vendors, ['performance_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0007_purchaseorder_metric_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='performance_score',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['-performance_score', 'id'], name='vendor_score_idx'),
+        ),
+        migrations.RunPython(compute_scores, migrations.RunPython.noop),
+    ]
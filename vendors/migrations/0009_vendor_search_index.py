@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Frozen copy of vendors.search.install_search_index as of this migration, so
+# that later changes to it do not change what it does.
+SEARCH_TABLE = 'vendors_vendor_fts'
+COLUMNS = 'name, contact_details, address'
+DELETE_OLD = (
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, {COLUMNS}) "
+    f"VALUES ('delete', old.id, old.name, old.contact_details, old.address);"
+)
+INSERT_NEW = (
+    f'INSERT INTO {SEARCH_TABLE} (rowid, {COLUMNS}) VALUES (new.id, new.name, new.contact_details, new.address);'
+)
+CREATE_STATEMENTS = [
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+    f"{COLUMNS}, content='vendors_vendor', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON vendors_vendor BEGIN {INSERT_NEW} END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON vendors_vendor BEGIN {DELETE_OLD} END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF {COLUMNS} ON vendors_vendor '
+    f'BEGIN {DELETE_OLD} {INSERT_NEW} END',
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')",
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')",
+]
+DROP_STATEMENTS = [
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_au',
+    f'DROP TABLE IF EXISTS {SEARCH_TABLE}',
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0008_vendor_performance_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_STATEMENTS), run_on_sqlite(DROP_STATEMENTS)),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.0.4 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of vendors.line_items.line_items as of this migration, so that
+# later changes to it do not change what it does.
+MAX_SKU_LENGTH = 100
+
+
+def _quantity(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def line_items(items):
+    if isinstance(items, dict):
+        entries = [{'sku': sku, 'quantity': quantity} for sku, quantity in items.items()]
+    elif isinstance(items, list):
+        entries = items
+    else:
+        return []
+
+    lines = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        sku = entry.get('sku')
+        if isinstance(sku, (int, float)) and not isinstance(sku, bool):
+            sku = str(sku)
+        if not isinstance(sku, str) or not sku.strip():
+            continue
+        quantity = _quantity(entry.get('quantity', 1))
+        if quantity is None:
+            continue
+        lines.append((sku.strip()[:MAX_SKU_LENGTH], quantity))
+    return lines
+
+
+def backfill_line_items(apps, schema_editor):
+    PurchaseOrder = apps.get_model('vendors', 'PurchaseOrder')
+    PurchaseOrderItem = apps.get_model('vendors', 'PurchaseOrderItem')
+    batch = []
+    orders = PurchaseOrder.objects.values_list('pk', 'vendor_id', 'order_date', 'items')
+    for pk, vendor_id, order_date, items in orders.iterator(chunk_size=1000):
+        for position, (sku, quantity) in enumerate(line_items(items)):
+            batch.append(PurchaseOrderItem(
+                purchase_order_id=pk, vendor_id=vendor_id, order_date=order_date,
+                position=position, sku=sku, quantity=quantity,
+            ))
+        if len(batch) >= 1000:
+            PurchaseOrderItem.objects.bulk_create(batch)
+            batch = []
+    PurchaseOrderItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0009_vendor_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('order_date', models.DateTimeField()),
+                ('sku', models.CharField(max_length=100)),
+                ('quantity', models.IntegerField()),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='vendors.purchaseorder')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vendors.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sku', 'vendor', 'order_date', 'quantity', 'purchase_order'], name='po_item_sku_vendor_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='purchaseorderitem',
+            constraint=models.UniqueConstraint(fields=('purchase_order', 'position'), name='unique_po_line_item'),
+        ),
+        migrations.RunPython(backfill_line_items, migrations.RunPython.noop),
+    ]
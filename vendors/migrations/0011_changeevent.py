@@ -0,0 +1,28 @@
+# Generated by Django 5.0.4 on 2026-10-18 18:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0010_purchaseorderitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('vendor', 'Vendor'), ('purchase_order', 'Purchase order')], max_length=20)),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('vendor_id', models.BigIntegerField()),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor_id', 'id'], name='change_vendor_seq_idx')],
+            },
+        ),
+    ]
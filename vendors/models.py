@@ -1,9 +1,11 @@
-from django.db import models
+from django.db import models, router
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from django.db.models import Avg
+
+from .db import write_transaction
+from .instrumentation import timed_signal_handler
 
 
 class Vendor(models.Model):
@@ -15,15 +17,49 @@ class Vendor(models.Model):
     quality_rating_avg = models.FloatField(default=0.0, validators=[MinValueValidator(0.0), MaxValueValidator(5.0)])
     average_response_time = models.FloatField(default=0.0)
     fulfillment_rate = models.FloatField(default=0.0, validators=[MinValueValidator(0.0), MaxValueValidator(100.0)])
+    # Weighted score of the metrics above, see vendors.ranking.
+    performance_score = models.FloatField(default=0.0, editable=False)
 
     class Meta:
         indexes = [
             models.Index(fields=['vendor_code']),
+            models.Index(fields=['-performance_score', 'id'], name='vendor_score_idx'),
         ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # The row write and its change feed event commit together.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with write_transaction(using):
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        # Collecting the orders reads before the cascade writes.
+        with write_transaction(using or router.db_for_write(type(self), instance=self)):
+            return super().delete(using=using, keep_parents=keep_parents)
+
+class VendorMetrics(models.Model):
+    """Running per-vendor counters behind the metric columns on ``Vendor``.
+
+    Every purchase order contributes a fixed set of counts and sums; saving or
+    deleting an order applies the difference between its old and new
+    contribution, so keeping the metrics current costs the same regardless of
+    how many orders a vendor has.
+    """
+    vendor = models.OneToOneField(Vendor, on_delete=models.CASCADE, primary_key=True, related_name='metrics')
+    total_orders = models.PositiveIntegerField(default=0)
+    completed_orders = models.PositiveIntegerField(default=0)
+    on_time_orders = models.PositiveIntegerField(default=0)
+    rated_orders = models.PositiveIntegerField(default=0)
+    quality_rating_sum = models.FloatField(default=0.0)
+    acknowledged_orders = models.PositiveIntegerField(default=0)
+    response_time_sum = models.FloatField(default=0.0)
+
+    def __str__(self):
+        return f'Metrics for {self.vendor_id}'
+
 class PurchaseOrder(models.Model):
 
     STATUS_CHOICES = [
@@ -42,61 +78,302 @@ class PurchaseOrder(models.Model):
     quality_rating = models.FloatField(null=True, blank=True)
     issue_date = models.DateTimeField()
     acknowledgment_date = models.DateTimeField(null=True, blank=True)
+    completion_date = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Fields the vendor metrics depend on. Their values as last loaded from or
+    # saved to the database are kept, so a save that does not change them
+    # leaves their columns alone and needs no metric work.
+    TRACKED_FIELDS = (
+        'vendor_id', 'status', 'delivery_date', 'completion_date',
+        'quality_rating', 'issue_date', 'acknowledgment_date',
+    )
+    LINE_ITEM_SOURCE_FIELDS = ('vendor_id', 'order_date', 'items')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', 'id'], name='po_vendor_id_idx'),
+            # Also serves filters on (vendor, status) alone.
+            models.Index(fields=['vendor', 'status', 'delivery_date'], name='po_vendor_status_delivery_idx'),
+            models.Index(
+                fields=['vendor', 'status', 'quality_rating'], name='po_vendor_rated_idx',
+                condition=models.Q(quality_rating__isnull=False),
+            ),
+            models.Index(
+                fields=['vendor', 'acknowledgment_date', 'issue_date'], name='po_vendor_acknowledged_idx',
+                condition=models.Q(acknowledgment_date__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.po_number
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields and 'completion_date' not in update_fields:
+            # completion_date follows status (see capture_previous_order_state).
+            kwargs['update_fields'] = [*update_fields, 'completion_date']
+        if (
+            not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+            and self.loaded_values is not None and not self.changed_fields()
+        ):
+            # Leave the tracked columns out of the UPDATE, so a concurrent
+            # change to them is neither overwritten nor missed by the metrics.
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in self.TRACKED_FIELDS and field.attname not in deferred
+            ]
+        # The stored state read by the pre_save receiver, the row write and
+        # the metric updates commit together.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with write_transaction(using):
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        # capture_deleted_order_state reads the stored row before the delete.
+        with write_transaction(using or router.db_for_write(type(self), instance=self)):
+            return super().delete(using=using, keep_parents=keep_parents)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_tracked_fields()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is not None:
+            fields = {self._meta.get_field(name).attname for name in fields}
+        self.snapshot_tracked_fields(fields)
+
+    def snapshot_tracked_fields(self, fields=None):
+        """Record the current values of the tracked fields (or of ``fields``) as persisted."""
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        deferred = self.get_deferred_fields()
+        for field in self.TRACKED_FIELDS:
+            if field not in deferred and (fields is None or field in fields):
+                loaded[field] = getattr(self, field)
+        if fields is None or not fields.isdisjoint(self.LINE_ITEM_SOURCE_FIELDS):
+            self.__dict__['_loaded_line_items'] = (
+                None if deferred.intersection(self.LINE_ITEM_SOURCE_FIELDS) else self.line_item_key()
+            )
+
+    def line_item_key(self):
+        """Everything the order's ``PurchaseOrderItem`` rows are derived from."""
+        from .line_items import line_items
+
+        return self.vendor_id, self.order_date, tuple(line_items(self.items))
+
+    def line_items_changed(self):
+        loaded = None if self._state.adding else self.__dict__.get('_loaded_line_items')
+        return loaded is None or loaded != self.line_item_key()
+
+    @property
+    def loaded_values(self):
+        """Persisted values of the tracked fields, or ``None`` if some are unknown."""
+        loaded = self.__dict__.get('_loaded_values', {})
+        if self._state.adding or len(loaded) < len(self.TRACKED_FIELDS):
+            return None
+        return dict(loaded)
+
+    def changed_fields(self):
+        """Tracked fields whose value differs from the persisted one.
+
+        Fields whose persisted value is unknown (new or partially loaded
+        instances) are reported as changed.
+        """
+        loaded = {} if self._state.adding else self.__dict__.get('_loaded_values', {})
+        return {
+            field for field in self.TRACKED_FIELDS
+            if field not in loaded or getattr(self, field) != loaded[field]
+        }
     
 
+@receiver(pre_save, sender=PurchaseOrder)
+@timed_signal_handler
+def capture_previous_order_state(sender, instance, update_fields=None, **kwargs):
+    # Stamp the moment an order is completed so on-time delivery can be
+    # decided per order, independently of any other order's dates.
+    if instance.status != 'completed':
+        instance.completion_date = None
+    elif instance.completion_date is None:
+        instance.completion_date = timezone.now()
+
+    current = {field: getattr(instance, field) for field in PurchaseOrder.TRACKED_FIELDS}
+    saved = None if update_fields is None else {PurchaseOrder._meta.get_field(name).attname for name in update_fields}
+    if saved is not None and saved.isdisjoint(PurchaseOrder.TRACKED_FIELDS):
+        # The write leaves every tracked column as stored.
+        previous = current = instance.loaded_values or current
+    else:
+        # Diff against the stored row, locked until the save commits, rather
+        # than against the values loaded earlier: another writer may have
+        # changed it since.
+        previous = None
+        if instance.pk is not None:
+            previous = (
+                PurchaseOrder.objects.select_for_update().filter(pk=instance.pk)
+                .values(*PurchaseOrder.TRACKED_FIELDS).first()
+            )
+        if previous is not None and saved is not None:
+            current = {field: value if field in saved else previous[field] for field, value in current.items()}
+    instance._pending_metric_state = (previous, current)
+
+
+def _metric_state(values):
+    from .metrics import order_contribution
+
+    return (values['vendor_id'], order_contribution(**values)) if values else None
+
+
 @receiver(post_save, sender=PurchaseOrder)
-def update_on_time_delivery_rate(sender, instance, **kwargs):
-    if instance.status == 'completed':
-        vendor = instance.vendor
-        completed_orders_count = PurchaseOrder.objects.filter(vendor=vendor, status='completed').count()
-        on_time_orders_count = PurchaseOrder.objects.filter(vendor=vendor, status='completed', delivery_date__lte=instance.delivery_date).count()
-        on_time_delivery_rate = on_time_orders_count / completed_orders_count if completed_orders_count > 0 else 0
-        vendor.on_time_delivery_rate = on_time_delivery_rate
-        vendor.save()
-    
+@timed_signal_handler
+def update_vendor_metrics(sender, instance, created=False, update_fields=None, using=None, **kwargs):
+    from .cache import bump_vendors
+    from .changes import record_changes
+    from .metrics import apply_order_change
+    from .scheduler import metrics_mode, mark_vendors_dirty
+
+    previous, current = instance.__dict__.pop('_pending_metric_state')
+    instance.snapshot_tracked_fields(
+        None if update_fields is None else {PurchaseOrder._meta.get_field(name).attname for name in update_fields}
+    )
+    vendor_ids = {current['vendor_id'], previous['vendor_id'] if previous else None}
+    # An order moved to another vendor shows up in the change feed of both.
+    record_changes(
+        'purchase_order', 'create' if created else 'update',
+        [(instance.pk, vendor_id) for vendor_id in sorted(vendor_ids - {None})], using=using,
+    )
+    if previous == current:
+        # Nothing the metrics depend on changed; cached responses still show
+        # the order itself.
+        bump_vendors(vendor_ids)
+        return
+    if metrics_mode() != 'sync':
+        mark_vendors_dirty(vendor_ids)
+        return
+    bump_vendors(vendor_ids)
+    apply_order_change(_metric_state(previous), _metric_state(current))
+
+@receiver(pre_delete, sender=PurchaseOrder)
+@timed_signal_handler
+def capture_deleted_order_state(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Vendor):
+        return
+    # Deletes run in a transaction; lock the stored row until it commits.
+    instance._deleted_metric_state = (
+        PurchaseOrder.objects.select_for_update().filter(pk=instance.pk)
+        .values(*PurchaseOrder.TRACKED_FIELDS).first()
+    )
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+@timed_signal_handler
+def remove_order_from_vendor_metrics(sender, instance, origin=None, using=None, **kwargs):
+    from .cache import bump_vendors
+    from .changes import record_changes
+    from .metrics import apply_order_change
+    from .scheduler import metrics_mode, mark_vendors_dirty
+
+    if isinstance(origin, Vendor):
+        # The vendor itself is being deleted along with its metrics.
+        record_changes('purchase_order', 'delete', [(instance.pk, instance.vendor_id)], using=using)
+        return
+    stored = instance.__dict__.pop('_deleted_metric_state', None)
+    if stored is None:
+        # Already deleted by another writer, which removed it from the metrics.
+        return
+    record_changes('purchase_order', 'delete', [(instance.pk, stored['vendor_id'])], using=using)
+    if metrics_mode() != 'sync':
+        mark_vendors_dirty({stored['vendor_id']})
+        return
+    bump_vendors({stored['vendor_id']})
+    apply_order_change(_metric_state(stored), None)
+
+
+@receiver(pre_save, sender=PurchaseOrder)
+@timed_signal_handler
+def capture_line_item_changes(sender, instance, update_fields=None, **kwargs):
+    saved = None if update_fields is None else {PurchaseOrder._meta.get_field(name).attname for name in update_fields}
+    instance._line_items_dirty = (
+        (saved is None or not saved.isdisjoint(PurchaseOrder.LINE_ITEM_SOURCE_FIELDS))
+        and instance.line_items_changed()
+    )
+
+
 @receiver(post_save, sender=PurchaseOrder)
-def update_quality_rating_avg(sender, instance, **kwargs):
-    if instance.status == 'completed' and instance.quality_rating is not None:
-        vendor = instance.vendor
-        completed_orders = PurchaseOrder.objects.filter(vendor=vendor, status='completed', quality_rating__isnull=False)
-        total_completed_order = completed_orders.count()
-        if total_completed_order > 0:
-            sum_quality_rating=models.Sum('quality_rating')
-            quality_rating_sum = completed_orders.aggregate(sum_quality_rating)['sum_quality_rating']
-            quality_rating_avg = quality_rating_sum / total_completed_order
+@timed_signal_handler
+def sync_order_line_items(sender, instance, created=False, **kwargs):
+    from .line_items import create_line_items, sync_line_items
+
+    if instance.__dict__.pop('_line_items_dirty', True):
+        if created:
+            create_line_items([instance])
         else:
-            quality_rating_avg = None
-        vendor.quality_rating_avg = quality_rating_avg
-        vendor.save()
+            sync_line_items(instance)
+        instance._loaded_line_items = instance.line_item_key()
 
-@receiver(post_save, sender=PurchaseOrder)
-def update_average_response_time(sender, instance, created, **kwargs):
-    if instance.acknowledgment_date is not None:  
-        vendor = instance.vendor
-        all_po_acknowledged = PurchaseOrder.objects.filter(vendor=vendor, acknowledgment_date__isnull=False)
-        total_po_acknowledged = all_po_acknowledged.count()
-        if total_po_acknowledged > 0:
-            average_response_time=Avg(models.F('acknowledgment_date') - models.F('issue_date'))
-            avg_response_time = all_po_acknowledged.aggregate(average_response_time)['average_response_time']
-            vendor.average_response_time = avg_response_time
-            vendor.save()
 
-@receiver(pre_save, sender=PurchaseOrder)
-def update_fulfilment_rate(sender, instance, **kwargs):
-    if instance.pk:  # Checks if the PurchaseOrder instance already exists
-        old_instance = PurchaseOrder.objects.get(pk=instance.pk)
-        if old_instance.status != instance.status:  # Checks if status has changed
-            vendor = instance.vendor
-            all_po_count = PurchaseOrder.objects.filter(vendor=vendor).count()
-            fulfilled_po_count = PurchaseOrder.objects.filter(vendor=vendor, status='completed').count()
-            if all_po_count > 0:
-                fulfilment_rate = fulfilled_po_count / all_po_count
-                vendor.fulfillment_rate = fulfilment_rate
-                vendor.save()
+@receiver(pre_save, sender=Vendor)
+@timed_signal_handler
+def update_performance_score(sender, instance, **kwargs):
+    from .ranking import SCORE_FIELDS, performance_score
+
+    instance.performance_score = performance_score({field: getattr(instance, field) for field in SCORE_FIELDS})
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+@timed_signal_handler
+def invalidate_vendor_responses(sender, instance, **kwargs):
+    from .cache import bump_vendors
+
+    bump_vendors({instance.pk})
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+@timed_signal_handler
+def record_vendor_change(sender, instance, signal, created=False, using=None, **kwargs):
+    from .changes import record_changes
+
+    action = 'delete' if signal is post_delete else 'create' if created else 'update'
+    record_changes('vendor', action, [(instance.pk, instance.pk)], using=using)
+
+
+class MetricRecomputeJob(models.Model):
+    """A vendor whose metrics must be recounted by the ``process_metric_jobs`` worker.
+
+    One row per vendor: marking an already queued vendor again is a no-op, so
+    bursts of purchase order writes collapse into a single recount.
+    """
+    vendor = models.OneToOneField(Vendor, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    requested_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'Recompute metrics for {self.vendor_id}'
+
+
+class PurchaseOrderItem(models.Model):
+    """One SKU line of ``PurchaseOrder.items``, derived by ``vendors.line_items``."""
+    purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='line_items')
+    position = models.PositiveIntegerField()
+    # Copied from the order so SKU queries by vendor and date need no join.
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='+')
+    order_date = models.DateTimeField()
+    sku = models.CharField(max_length=100)
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['purchase_order', 'position'], name='unique_po_line_item'),
+        ]
+        indexes = [
+            # Covers SKU lookups and the per-vendor SKU totals.
+            models.Index(fields=['sku', 'vendor', 'order_date', 'quantity', 'purchase_order'], name='po_item_sku_vendor_idx'),
+        ]
 
+    def __str__(self):
+        return f'{self.sku} x {self.quantity}'
 
 
 class HistoricalPerformance(models.Model):
@@ -106,3 +383,40 @@ class HistoricalPerformance(models.Model):
     quality_rating_avg = models.FloatField()
     average_response_time = models.FloatField()
     fulfillment_rate = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'date'], name='unique_vendor_snapshot'),
+        ]
+
+
+class ChangeEvent(models.Model):
+    """One entry of the append-only change feed, see ``vendors.changes``.
+
+    The auto-incremented primary key is the event's sequence number.
+    """
+    KIND_CHOICES = [
+        ('vendor', 'Vendor'),
+        ('purchase_order', 'Purchase order'),
+    ]
+    ACTION_CHOICES = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.BigIntegerField()
+    # The vendor itself, or the one the purchase order belongs to. Not a
+    # foreign key: events outlive the rows they describe.
+    vendor_id = models.BigIntegerField()
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor_id', 'id'], name='change_vendor_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.pk}: {self.action} {self.kind} {self.object_id}'
@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Opaque cursor pagination ordered by primary key.
+
+    Pages are fetched with ``WHERE id > <cursor> ORDER BY id LIMIT n``, so page
+    N costs the same as page 1. Filtering by vendor is an equality on
+    ``vendor_id``, which the ``(vendor, id)`` index on ``PurchaseOrder`` serves
+    in the same order.
+    """
+    ordering = 'id'
+    page_size = getattr(settings, 'VMS_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'VMS_MAX_PAGE_SIZE', 1000)
+
+    def is_requested(self, request):
+        """Lists stay unpaginated unless the client asks for a page."""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'prev': self.get_previous_link(),
+            'results': data,
+        })
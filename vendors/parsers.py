@@ -0,0 +1,94 @@
+import codecs
+import io
+import json
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# What the surrogateescape error handler decodes an invalid byte to.
+UNDECODED_BYTE = re.compile('[\udc80-\udcff]')
+
+
+class FastJSONParser(JSONParser):
+    """
+    ``JSONParser`` that decodes UTF-8 bodies with orjson when it is installed.
+
+    orjson accepts a subset of what ``json`` does (no integers beyond 64 bits,
+    no lone surrogates), so any body it rejects is handed to ``JSONParser``,
+    which returns the same data or raises the same error as before.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies (``Content-Type: application/msgpack``).
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured('MessagePackParser requires msgpack to be installed')
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            # FormatError carries no message, and unhashable map keys raise TypeError.
+            raise ParseError('MessagePack parse error - %s' % (str(exc) or type(exc).__name__))
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON into a list, one element per non-blank line.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        rows = []
+        line_number = 0
+        try:
+            # Split the bytes on newlines only: a decoding reader would also
+            # split on U+2028 and the like, which may appear inside strings.
+            # Undecodable bytes become lone surrogates, which valid text never
+            # contains, so they are reported on the line they occur on.
+            for line_number, raw in enumerate(iter(stream.readline, b''), start=1):
+                line = raw.decode(encoding, 'surrogateescape')
+                invalid = UNDECODED_BYTE.search(line)
+                if invalid:
+                    raise ParseError('NDJSON parse error on line %d - invalid %s byte 0x%02x at column %d' % (
+                        line_number, encoding, ord(invalid.group()) - 0xdc00, invalid.start() + 1,
+                    ))
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as exc:
+                    raise ParseError('NDJSON parse error on line %d - %s' % (line_number, exc))
+        except UnicodeDecodeError as exc:
+            raise ParseError('NDJSON parse error after line %d - %s' % (line_number, exc))
+        return rows
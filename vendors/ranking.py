@@ -0,0 +1,143 @@
+"""
+Vendor ranking by a weighted performance score.
+
+Each metric is mapped onto ``[0, 1]`` (higher is better) and combined with
+weights normalised to sum to 1:
+
+- ``on_time_delivery_rate`` and ``fulfillment_rate`` are already fractions;
+- ``quality_rating_avg`` is divided by the maximum rating of 5;
+- ``average_response_time`` becomes ``scale / (scale + seconds)`` with
+  ``RESPONSE_TIME_SCALE`` of one day, and 0 for vendors with no acknowledged
+  orders (stored as a response time of 0).
+
+The score for the configured ``VMS_SCORE_WEIGHTS`` is stored on
+``Vendor.performance_score`` wherever the metric columns are written, so the
+default leaderboard is an index range scan. Other weights are ranked with a
+heap over the metric columns.
+"""
+import heapq
+import math
+
+from django.conf import settings
+from django.db.models import Case, ExpressionWrapper, FloatField, Value, When
+from django.db.models.lookups import GreaterThan
+
+from .models import Vendor
+
+SCORE_FIELDS = ('on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate')
+
+WEIGHT_ALIASES = {
+    'on_time': 'on_time_delivery_rate',
+    'quality': 'quality_rating_avg',
+    'response_time': 'average_response_time',
+    'fulfillment': 'fulfillment_rate',
+}
+
+DEFAULT_WEIGHTS = {
+    'on_time_delivery_rate': 0.35,
+    'quality_rating_avg': 0.35,
+    'average_response_time': 0.1,
+    'fulfillment_rate': 0.2,
+}
+
+MAX_QUALITY_RATING = 5.0
+RESPONSE_TIME_SCALE = 86400.0
+SCAN_CHUNK_SIZE = 2000
+
+
+def normalize_weights(weights):
+    total = sum(weights.values())
+    return {field: weights.get(field, 0.0) / total for field in SCORE_FIELDS}
+
+
+def score_weights():
+    """The normalised weights behind the stored ``performance_score``."""
+    return normalize_weights(getattr(settings, 'VMS_SCORE_WEIGHTS', DEFAULT_WEIGHTS))
+
+
+def performance_score(values, weights=None):
+    """Score a mapping of the metric fields with normalised ``weights``."""
+    weights = weights or score_weights()
+    response_time = values['average_response_time']
+    components = {
+        'on_time_delivery_rate': values['on_time_delivery_rate'],
+        'quality_rating_avg': values['quality_rating_avg'] / MAX_QUALITY_RATING,
+        'average_response_time': RESPONSE_TIME_SCALE / (RESPONSE_TIME_SCALE + response_time) if response_time > 0 else 0.0,
+        'fulfillment_rate': values['fulfillment_rate'],
+    }
+    return sum(weights[field] * components[field] for field in SCORE_FIELDS)
+
+
+def performance_score_expression(metrics, weights=None):
+    """SQL counterpart of ``performance_score`` over metric ``expressions``."""
+    weights = weights or score_weights()
+    response_time = metrics['average_response_time']
+    components = {
+        'on_time_delivery_rate': metrics['on_time_delivery_rate'],
+        'quality_rating_avg': metrics['quality_rating_avg'] / Value(MAX_QUALITY_RATING),
+        'average_response_time': Case(
+            When(GreaterThan(response_time, 0), then=Value(RESPONSE_TIME_SCALE) / (Value(RESPONSE_TIME_SCALE) + response_time)),
+            default=Value(0.0), output_field=FloatField(),
+        ),
+        'fulfillment_rate': metrics['fulfillment_rate'],
+    }
+    score = Value(0.0)
+    for field in SCORE_FIELDS:
+        if weights[field]:
+            score = score + Value(weights[field]) * components[field]
+    return ExpressionWrapper(score, output_field=FloatField())
+
+
+def parse_weights(raw):
+    """Parse ``?weights=on_time:2,quality:1``; unspecified metrics weigh 0.
+
+    Returns normalised weights. Raises ``ValueError`` with a client-facing
+    message on invalid input.
+    """
+    weights = {}
+    for part in raw.split(','):
+        name, sep, value = part.partition(':')
+        name = WEIGHT_ALIASES.get(name.strip(), name.strip())
+        if not sep or name not in SCORE_FIELDS:
+            raise ValueError(
+                'weights must be comma-separated metric:weight pairs, metrics being one of: '
+                + ', '.join([*WEIGHT_ALIASES, *SCORE_FIELDS])
+            )
+        try:
+            weight = float(value)
+        except ValueError:
+            weight = -1.0
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f'Invalid weight for {name}: {value}')
+        weights[name] = weight
+    if not sum(weights.values()):
+        raise ValueError('At least one weight must be positive')
+    return normalize_weights(weights)
+
+
+def parse_k(raw):
+    try:
+        k = int(raw)
+    except ValueError:
+        k = 0
+    if k < 1:
+        raise ValueError('k must be a positive integer')
+    return min(k, settings.VMS_TOP_K_MAX)
+
+
+def is_default(weights):
+    stored = score_weights()
+    return all(math.isclose(weights[field], stored[field], abs_tol=1e-12) for field in SCORE_FIELDS)
+
+
+def top_vendors(k, weights=None):
+    """Return ``[(vendor_id, score)]`` of the ``k`` best vendors, best first.
+
+    Ties are broken by ascending vendor id.
+    """
+    if weights is None or is_default(weights):
+        return list(Vendor.objects.order_by('-performance_score', 'id').values_list('id', 'performance_score')[:k])
+
+    rows = Vendor.objects.order_by().values_list('id', *SCORE_FIELDS).iterator(chunk_size=SCAN_CHUNK_SIZE)
+    scored = ((performance_score(dict(zip(SCORE_FIELDS, values)), weights), -pk) for pk, *values in rows)
+    return [(-negated_pk, score) for score, negated_pk in heapq.nlargest(k, scored)]
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# orjson writes floats below 1e-4 or from 1e16 up differently from ``json``
+# ("0.00001" vs "1e-05", "1e16" vs "1e+16"). With the digits 1-9 mapped to 1
+# and every character that can precede a number mapped to ":", such numbers
+# always contain "1e" (the shortest mantissa never ends in 0) or ":0.0000", or
+# start with "0.0000" when the float is the whole document; strings that happen
+# to as well only cost a fallback. U+2029 is folded onto U+2028 to find either
+# in the same pass.
+FLOAT_SCAN = bytes.maketrans(b'23456789E,[-\xa9', b'11111111e:::\xa8')
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return value
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders a list as newline-delimited JSON, one element per line.
+
+    List endpoints use this format to stream exports, see ``vendors.export``.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(
+            json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n' for row in rows
+        ).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders a list of flat dicts as CSV with a header row. Nested values are
+    written as JSON.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        header = list(rows[0]) if rows and isinstance(rows[0], dict) else []
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([csv_value(row.get(field)) for field in header])
+        return buffer.getvalue().encode(self.charset)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` that encodes with orjson when it is installed, producing
+    the same bytes several times faster.
+
+    Values orjson does not support natively go through DRF's ``JSONEncoder``.
+    Anything orjson would write differently falls back to the standard
+    encoder: indented output, non-default ``UNICODE_JSON``/``COMPACT_JSON``/
+    ``STRICT_JSON`` settings, floats in exponent notation, and values orjson rejects (such as
+    integers beyond 64 bits). One difference remains: NaN and infinity are
+    written as ``null`` instead of failing the request.
+    """
+    _default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self._default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        scan = content.translate(FLOAT_SCAN)
+        if b'1e' in scan or b':0.0000' in scan or scan.startswith(b'0.0000'):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in scan:
+            # Like JSONRenderer, escape the separators that are invalid in JavaScript.
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack for clients sending ``Accept: application/msgpack``.
+
+    Values are the same as in the JSON output: whatever JSON would encode as a
+    string (dates, decimals, lazy text) is packed as that string.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    _default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured('MessagePackRenderer requires msgpack to be installed')
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self._default, use_bin_type=True)
@@ -0,0 +1,144 @@
+"""
+Scheduling of vendor metric recomputation.
+
+``VMS_METRICS_MODE`` selects where metric work runs:
+
+``'sync'``
+    Metrics are updated inside the request that wrote the purchase order
+    (incrementally for single saves, see ``vendors.metrics``).
+``'deferred'``
+    Vendors are marked dirty once the transaction commits and recounted by an
+    in-process thread pool of ``VMS_METRICS_WORKERS`` threads.
+``'queue'``
+    Vendors are recorded in the ``MetricRecomputeJob`` table as part of the
+    writing transaction and recounted by ``manage.py process_metric_jobs``.
+
+In every mode repeated marks for the same vendor are coalesced, so a burst of
+writes for one vendor costs a single recount.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache import bump_vendors
+from .db import write_transaction
+from .metrics import rebuild_vendor_metrics
+from .models import MetricRecomputeJob
+
+logger = logging.getLogger(__name__)
+
+METRICS_MODES = ('sync', 'deferred', 'queue')
+DRAIN_BATCH_SIZE = 100
+
+_lock = threading.Lock()
+_idle = threading.Condition(_lock)
+_pending = set()
+_running = set()
+_active_drainers = 0
+_executor = None
+
+
+def metrics_mode():
+    mode = getattr(settings, 'VMS_METRICS_MODE', 'sync')
+    if mode not in METRICS_MODES:
+        raise ValueError(f'VMS_METRICS_MODE must be one of {METRICS_MODES}, not {mode!r}')
+    return mode
+
+
+def mark_vendors_dirty(vendor_ids, using=None):
+    """Schedule a recount of the metrics of ``vendor_ids``."""
+    vendor_ids = {pk for pk in vendor_ids if pk is not None}
+    if not vendor_ids:
+        return
+
+    bump_vendors(vendor_ids, using=using)
+    mode = metrics_mode()
+    if mode == 'sync':
+        rebuild_vendor_metrics(vendor_ids)
+    elif mode == 'deferred':
+        transaction.on_commit(lambda: _enqueue(vendor_ids), using=using)
+    else:
+        now = timezone.now()
+        MetricRecomputeJob.objects.using(using).bulk_create(
+            [MetricRecomputeJob(vendor_id=pk, requested_at=now) for pk in sorted(vendor_ids)],
+            ignore_conflicts=True,
+        )
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'VMS_METRICS_WORKERS', 2),
+            thread_name_prefix='vms-metrics',
+        )
+    return _executor
+
+
+def _enqueue(vendor_ids):
+    global _active_drainers
+    with _lock:
+        _pending.update(vendor_ids)
+        if _active_drainers >= getattr(settings, 'VMS_METRICS_WORKERS', 2):
+            # A busy drainer will pick the new vendors up before it exits.
+            return
+        _active_drainers += 1
+    _get_executor().submit(_drain)
+
+
+def _drain():
+    global _active_drainers
+    try:
+        while True:
+            with _lock:
+                # Vendors already being recounted by another thread stay
+                # pending, so two recounts of one vendor never race.
+                batch = [pk for pk in _pending if pk not in _running][:DRAIN_BATCH_SIZE]
+                if not batch:
+                    _active_drainers -= 1
+                    _idle.notify_all()
+                    return
+                _pending.difference_update(batch)
+                _running.update(batch)
+            try:
+                rebuild_vendor_metrics(batch)
+                bump_vendors(batch)
+            except Exception:
+                logger.exception('Recomputing metrics for vendors %s failed', batch)
+            finally:
+                with _lock:
+                    _running.difference_update(batch)
+    finally:
+        connections.close_all()
+
+
+def wait_until_idle(timeout=None):
+    """Block until the deferred queue is drained. Returns ``False`` on timeout."""
+    with _lock:
+        return _idle.wait_for(lambda: not _pending and not _active_drainers, timeout=timeout)
+
+
+def process_metric_jobs(batch_size=DRAIN_BATCH_SIZE):
+    """Claim and recount one batch of queued vendors. Returns the batch size."""
+    with write_transaction():
+        vendor_ids = list(
+            MetricRecomputeJob.objects.order_by('requested_at').values_list('vendor_id', flat=True)[:batch_size]
+        )
+        # Claim the jobs before recounting: a vendor marked again while the
+        # recount runs gets a fresh job instead of being lost.
+        MetricRecomputeJob.objects.filter(vendor_id__in=vendor_ids).delete()
+    if not vendor_ids:
+        return 0
+    try:
+        rebuild_vendor_metrics(vendor_ids)
+    except Exception:
+        MetricRecomputeJob.objects.bulk_create(
+            [MetricRecomputeJob(vendor_id=pk) for pk in vendor_ids], ignore_conflicts=True,
+        )
+        raise
+    bump_vendors(vendor_ids)
+    return len(vendor_ids)
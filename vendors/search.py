@@ -0,0 +1,130 @@
+"""
+Full-text vendor search.
+
+On SQLite, vendors are indexed in ``vendors_vendor_fts``, an FTS5 table over
+``name``, ``contact_details`` and ``address`` that uses ``vendors_vendor`` as
+its external content. Triggers on ``vendors_vendor`` keep it in sync with
+every write, including ``bulk_create()`` and queryset updates; metric-only
+updates do not touch it. Every word of a query is matched as a prefix and
+results are ranked with BM25, weighting name matches highest.
+
+The table and triggers are created by migration ``0009`` and re-created after
+each ``migrate`` if missing, since SQLite table rebuilds drop triggers.
+``manage.py rebuild_vendor_search`` repopulates the index in bulk. Other
+databases fall back to case-insensitive substring filters.
+"""
+import re
+
+from django.db import connection as default_connection, connections, router
+from django.db.models import Q
+
+from .models import Vendor
+
+SEARCH_TABLE = 'vendors_vendor_fts'
+SEARCH_MIGRATION = '0009_vendor_search_index'
+SEARCH_COLUMNS = ('name', 'contact_details', 'address')
+# BM25 weight of each column in SEARCH_COLUMNS.
+COLUMN_WEIGHTS = (10.0, 2.0, 1.0)
+
+TERM = re.compile(r'\w+')
+
+
+def search_supported(connection=default_connection):
+    return connection.vendor == 'sqlite'
+
+
+def _table_exists(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+    return cursor.fetchone() is not None
+
+
+def install_search_index(connection=default_connection, rebuild=False):
+    """Create the FTS table and triggers if missing and (re)populate it.
+
+    The index is only repopulated when the table was just created or
+    ``rebuild`` is true. Returns whether it was repopulated.
+    """
+    if not search_supported(connection):
+        return False
+    vendors = Vendor._meta.db_table
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    delete_old = (
+        f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f'INSERT INTO {SEARCH_TABLE} (rowid, {columns}) VALUES (new.id, {new_values});'
+
+    with connection.cursor() as cursor:
+        created = not _table_exists(cursor)
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+            f"{columns}, content='{vendors}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON {vendors} BEGIN {insert_new} END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON {vendors} BEGIN {delete_old} END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF {columns} ON {vendors} '
+            f'BEGIN {delete_old} {insert_new} END'
+        )
+        if created or rebuild:
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+            return True
+    return False
+
+
+def drop_search_index(connection=default_connection):
+    if not search_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}')
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """``post_migrate`` receiver restoring the table and triggers when missing."""
+    from django.db.migrations.recorder import MigrationRecorder
+
+    connection = connections[using]
+    if not search_supported(connection):
+        return
+    if ('vendors', SEARCH_MIGRATION) in MigrationRecorder(connection).applied_migrations():
+        install_search_index(connection)
+
+
+def search_terms(query):
+    terms = TERM.findall(query)
+    if not terms:
+        raise ValueError('q must contain at least one word')
+    return terms
+
+
+def search_vendors(query, limit):
+    """Return the ids of the best ``limit`` vendors matching ``query``, best first.
+
+    Raises ``ValueError`` with a client-facing message on an empty query.
+    """
+    terms = search_terms(query)
+    connection = connections[router.db_for_read(Vendor)]
+    if not search_supported(connection):
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(contact_details__icontains=term) | Q(address__icontains=term)
+        return list(Vendor.objects.filter(condition).order_by('id').values_list('id', flat=True)[:limit])
+
+    match = ' AND '.join('"{}"*'.format(term) for term in terms)
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            f'ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid LIMIT %s',
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,4 +1,8 @@
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from .authentication import CachedRefreshToken
+from .line_items import create_line_items
 from .models import Vendor, PurchaseOrder, HistoricalPerformance
 
 
@@ -38,3 +42,101 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
         model = PurchaseOrder
         fields = '__all__'
 
+
+# Related objects that ``?expand=`` may embed in purchase order lists.
+PURCHASE_ORDER_EXPANSIONS = {'vendor': VendorSerializer}
+
+
+class BulkVendorField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves vendors from the map preloaded by ``PurchaseOrderListSerializer``
+    instead of issuing one query per row.
+    """
+    def to_internal_value(self, data):
+        vendors = self.context.get('bulk_vendors')
+        if vendors is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return vendors[int(data)]
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class PurchaseOrderListSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of purchase orders with a fixed number of queries and
+    inserts them with a single ``bulk_create``.
+    """
+    unique_error = 'purchase order with this po number already exists.'
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            # Let DRF report non-list and empty input the usual way.
+            return super().to_internal_value(data)
+
+        vendor_ids = set()
+        for row in data:
+            vendor = row.get('vendor') if isinstance(row, dict) else None
+            if isinstance(vendor, (int, str)) and not isinstance(vendor, bool) and str(vendor).isdigit():
+                vendor_ids.add(int(vendor))
+        self.context['bulk_vendors'] = Vendor.objects.only('pk').in_bulk(vendor_ids)
+
+        validated = []
+        errors = []
+        for row in data:
+            try:
+                validated.append(self.run_child_validation(row))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                validated.append(None)
+                errors.append(exc.detail)
+
+        # po_number uniqueness for the whole batch in one query. Numbers used
+        # earlier in the batch, or reserved by earlier chunks of the same
+        # ingest, count as taken too.
+        reserved = self.context.get('reserved_po_numbers', set())
+        po_numbers = [row['po_number'] for row in validated if row is not None]
+        taken = set(PurchaseOrder.objects.filter(po_number__in=po_numbers).values_list('po_number', flat=True))
+        taken.update(reserved.intersection(po_numbers))
+        for index, row in enumerate(validated):
+            if row is None:
+                continue
+            if row['po_number'] in taken:
+                errors[index] = {'po_number': [self.unique_error]}
+            taken.add(row['po_number'])
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        reserved.update(po_numbers)
+        return validated
+
+    def create(self, validated_data):
+        now = timezone.now()
+        orders = [PurchaseOrder(**row) for row in validated_data]
+        for order in orders:
+            # bulk_create bypasses the pre_save signal that stamps this.
+            if order.status == 'completed':
+                order.completion_date = now
+        orders = PurchaseOrder.objects.bulk_create(orders)
+        create_line_items(orders)
+        return orders
+
+
+class PurchaseOrderBulkSerializer(PurchaseOrderSerializer):
+    vendor = BulkVendorField(queryset=Vendor.objects.all())
+
+    class Meta(PurchaseOrderSerializer.Meta):
+        list_serializer_class = PurchaseOrderListSerializer
+        extra_kwargs = {'po_number': {'validators': []}}
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    token_class = CachedRefreshToken
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = CachedRefreshToken
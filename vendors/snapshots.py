@@ -0,0 +1,70 @@
+"""
+Periodic ``HistoricalPerformance`` snapshots.
+
+One snapshot row per vendor and bucket (hour or day). The metrics of every
+vendor are computed with a single grouped aggregate over ``PurchaseOrder`` and
+written with ``bulk_create``; re-running a snapshot within the same bucket
+overwrites that bucket's rows instead of adding new ones.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .cache import bump_scopes
+from .db import write_transaction
+from .metrics import COUNTER_FIELDS, METRIC_FIELDS, metric_values, recount
+from .models import HistoricalPerformance, Vendor
+
+SNAPSHOT_BUCKETS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+WRITE_BATCH_SIZE = 1000
+
+
+def bucket_start(moment, bucket):
+    """Truncate ``moment`` to the start of its hour or (UTC) day."""
+    if bucket not in SNAPSHOT_BUCKETS:
+        raise ValueError(f'bucket must be one of {tuple(SNAPSHOT_BUCKETS)}, not {bucket!r}')
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def next_bucket_start(moment, bucket):
+    return bucket_start(moment, bucket) + SNAPSHOT_BUCKETS[bucket]
+
+
+def snapshot_vendor_performance(bucket='day', at=None):
+    """Write one ``HistoricalPerformance`` row per vendor for the bucket containing ``at``.
+
+    Returns the number of rows written.
+    """
+    date = bucket_start(at or timezone.now(), bucket)
+    counters = recount()
+    empty = dict.fromkeys(COUNTER_FIELDS, 0)
+
+    written = 0
+    vendor_ids = Vendor.objects.order_by('pk').values_list('pk', flat=True)
+    with write_transaction():
+        batch = []
+        for vendor_id in vendor_ids.iterator(chunk_size=WRITE_BATCH_SIZE):
+            batch.append(HistoricalPerformance(
+                vendor_id=vendor_id, date=date, **metric_values(counters.get(vendor_id, empty)),
+            ))
+            if len(batch) >= WRITE_BATCH_SIZE:
+                written += _write(batch)
+                batch = []
+        if batch:
+            written += _write(batch)
+        bump_scopes({'history'})
+    return written
+
+
+def _write(batch):
+    HistoricalPerformance.objects.bulk_create(
+        batch, update_conflicts=True, unique_fields=['vendor', 'date'], update_fields=METRIC_FIELDS,
+    )
+    return len(batch)
@@ -1,3 +1,1106 @@
-from django.test import TestCase
+import gzip
+import json
+import re
+import statistics
+import threading
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Avg, Count, F
+from django.db.models.functions import TruncMonth
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .analytics import HISTORY_METRICS, analytics_available
+from .authentication import CachedJWTAuthentication, CachedRefreshToken, blacklist_cache, identity_cache
+from .cache import local_cache
+from .changes import compact_changes
+from .checks import check_response_cache_backend
+from .db import write_transaction
+from .history import history_query
+from .line_items import backfill_line_items, line_items, orders_with_sku, sku_vendor_totals
+from .metrics import COUNTER_FIELDS, rebuild_vendor_metrics, recount, recount_queryset, vendor_values
+from .models import (
+    ChangeEvent, HistoricalPerformance, MetricRecomputeJob, PurchaseOrder, PurchaseOrderItem, Vendor, VendorMetrics,
+)
+from .serializers import PurchaseOrderSerializer, VendorSerializer
+from .ranking import SCORE_FIELDS, performance_score, score_weights
+from .renderers import FastJSONRenderer, msgpack
+from .scheduler import process_metric_jobs, wait_until_idle
+
+FULL_SCAN = re.compile(r'\bSCAN (\w+)')
+
+
+def create_vendor(code, **fields):
+    return Vendor.objects.create(name=f'Vendor {code}', contact_details='c', address='a', vendor_code=code, **fields)
+
+
+def create_order(vendor, po_number, **fields):
+    now = timezone.now()
+    values = {
+        'order_date': now, 'delivery_date': now + timedelta(days=1), 'issue_date': now - timedelta(hours=2),
+        'items': [{'sku': 'SKU-1', 'quantity': 2}], 'quantity': 2, 'status': 'pending', **fields,
+    }
+    return PurchaseOrder.objects.create(po_number=po_number, vendor=vendor, **values)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class QueryPlanTests(TestCase):
+    """The hot purchase order, line item and history queries must be answered from an index."""
+
+    def assertUsesIndex(self, queryset, index=None):
+        plan = queryset.explain()
+        scanned = set(FULL_SCAN.findall(plan)) & {
+            PurchaseOrder._meta.db_table, HistoricalPerformance._meta.db_table, PurchaseOrderItem._meta.db_table,
+        }
+        self.assertFalse(scanned, f'Full table scan of {", ".join(sorted(scanned))}:\n{plan}')
+        if index is not None:
+            self.assertRegex(plan, rf'INDEX {index}\b')
+
+    def test_vendor_status(self):
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(vendor_id=1, status='completed'),
+            'po_vendor_status_delivery_idx',
+        )
+
+    def test_on_time_deliveries(self):
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(vendor_id=1, status='completed', completion_date__lte=F('delivery_date')),
+            'po_vendor_status_delivery_idx',
+        )
+
+    def test_rated_orders(self):
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(vendor_id=1, status='completed', quality_rating__isnull=False)
+            .values('vendor_id').annotate(avg=Avg('quality_rating')),
+            'po_vendor_rated_idx',
+        )
+
+    def test_acknowledged_orders(self):
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(vendor_id=1, acknowledgment_date__isnull=False)
+            .values('vendor_id').annotate(avg=Avg(F('acknowledgment_date') - F('issue_date'))),
+            'po_vendor_acknowledged_idx',
+        )
+
+    def test_recount(self):
+        self.assertUsesIndex(recount_queryset([1, 2, 3]))
+
+    def test_purchase_order_list_by_vendor(self):
+        self.assertUsesIndex(PurchaseOrder.objects.filter(vendor_id=1).order_by('id'), 'po_vendor_id_idx')
+
+    def test_history(self):
+        queryset, bucketed = history_query(1, {})
+        self.assertUsesIndex(queryset)
+        queryset, bucketed = history_query(1, {'bucket': 'week', 'from': '2024-01-01'})
+        self.assertUsesIndex(queryset)
+
+    def test_leaderboard(self):
+        self.assertUsesIndex(Vendor.objects.order_by('-performance_score', 'id')[:20], 'vendor_score_idx')
+
+    def test_orders_with_sku(self):
+        self.assertUsesIndex(orders_with_sku('SKU-0001'), 'po_item_sku_vendor_idx')
+        self.assertUsesIndex(orders_with_sku('SKU-0001', vendor_id=1), 'po_item_sku_vendor_idx')
+
+    def test_sku_vendor_totals(self):
+        self.assertUsesIndex(sku_vendor_totals('SKU-0001'), 'po_item_sku_vendor_idx')
+
+
+class RecountAssertions:
+    def assertMatchesRecount(self):
+        expected = recount()
+        empty = dict.fromkeys(COUNTER_FIELDS, 0)
+        for vendor in Vendor.objects.all():
+            counters = expected.get(vendor.pk, empty)
+            # Vendors without orders may have no counters row yet.
+            stored = VendorMetrics.objects.filter(pk=vendor.pk).values(*COUNTER_FIELDS).first() or empty
+            for field in COUNTER_FIELDS:
+                self.assertAlmostEqual(stored[field], counters[field], msg=f'{field} of vendor {vendor.pk}')
+            for field, value in vendor_values(counters).items():
+                self.assertAlmostEqual(getattr(vendor, field), value, msg=f'{field} of vendor {vendor.pk}')
+
+
+class VendorMetricsTests(RecountAssertions, TestCase):
+    """The incrementally maintained counters must always equal a full recount."""
+
+    def test_status_update_fields_writes_completion_date(self):
+        order = create_order(create_vendor('A'), 'PO-1')
+        order.status = 'completed'
+        order.save(update_fields=['status'])
+        stored = PurchaseOrder.objects.get(pk=order.pk)
+        self.assertIsNotNone(stored.completion_date)
+        self.assertEqual(stored.completion_date, order.completion_date)
+        self.assertEqual(Vendor.objects.get(pk=order.vendor_id).on_time_delivery_rate, 1.0)
+        self.assertMatchesRecount()
+
+    def test_mixed_writes_match_recount(self):
+        first, second = create_vendor('A'), create_vendor('B')
+        orders = [create_order(first, f'PO-{index}') for index in range(6)]
+        orders[0].status = 'completed'
+        orders[0].quality_rating = 4.5
+        orders[0].save()
+        orders[1].acknowledgment_date = timezone.now()
+        orders[1].save()
+        orders[2].status = 'completed'
+        orders[2].save(update_fields=['status'])
+        orders[3].delivery_date = timezone.now() - timedelta(days=3)
+        orders[3].status = 'completed'
+        orders[3].save()
+        # Move a completed, rated order to the other vendor.
+        orders[0].vendor = second
+        orders[0].save()
+        orders[4].delete()
+        orders[2].status = 'canceled'
+        orders[2].save()
+        create_order(second, 'PO-late', status='completed', quality_rating=2.0,
+                     delivery_date=timezone.now() - timedelta(days=1), acknowledgment_date=timezone.now())
+        self.assertMatchesRecount()
+        self.assertEqual(VendorMetrics.objects.get(pk=second.pk).total_orders, 2)
+
+
+class APITests(TestCase):
+    """Calls the API with an empty response cache, which TestCase transactions never invalidate."""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.client = APIClient()
+
+
+class BulkIngestTests(RecountAssertions, APITests):
+    url = '/api/purchase_orders/bulk/'
+
+    def setUp(self):
+        super().setUp()
+        self.vendor = create_vendor('A')
+
+    def order_row(self, po_number, **fields):
+        now = timezone.now()
+        return {
+            'po_number': po_number, 'vendor': self.vendor.pk, 'order_date': now.isoformat(),
+            'delivery_date': (now + timedelta(days=1)).isoformat(), 'issue_date': now.isoformat(),
+            'items': [{'sku': 'SKU-1', 'quantity': 3}, {'sku': 'SKU-2', 'quantity': 1}],
+            'quantity': 4, 'status': 'pending', **fields,
+        }
+
+    def ndjson(self, rows):
+        return ''.join(json.dumps(row) + '\n' for row in rows).encode()
+
+    def test_json_batch(self):
+        rows = [self.order_row('PO-1'), self.order_row('PO-2', status='completed', quality_rating=4.0)]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 2)
+        ids = response.data['ids']
+        self.assertEqual(list(PurchaseOrder.objects.order_by('pk').values_list('po_number', flat=True)), ['PO-1', 'PO-2'])
+        self.assertEqual(PurchaseOrderItem.objects.filter(purchase_order_id__in=ids).count(), 4)
+        self.assertEqual(VendorMetrics.objects.get(pk=self.vendor.pk).total_orders, 2)
+        self.assertMatchesRecount()
+        self.assertEqual(
+            list(ChangeEvent.objects.filter(kind='purchase_order').values_list('action', 'object_id', 'vendor_id')),
+            [('create', pk, self.vendor.pk) for pk in ids],
+        )
+
+    def test_ndjson_batch(self):
+        body = self.ndjson([self.order_row('PO-1'), self.order_row('PO-2')]) + '\n'.encode()
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 2)
+
+    def test_ndjson_bad_line(self):
+        body = self.ndjson([self.order_row('PO-1')]) + b'{"po_number": \n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', response.data['detail'])
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_ndjson_invalid_utf8(self):
+        body = self.ndjson([self.order_row('PO-1')]) + b'{"po_number": "\xff"}\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', response.data['detail'])
+
+    def test_invalid_row_rejects_atomic_batch(self):
+        response = self.client.post(self.url, [self.order_row('PO-1'), self.order_row('PO-2', vendor=0)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertFalse(PurchaseOrder.objects.exists())
+        self.assertFalse(ChangeEvent.objects.filter(kind='purchase_order').exists())
+
+    def test_integrity_error_rejects_atomic_batch(self):
+        rows = [self.order_row('PO-1'), self.order_row('PO-2')]
+        with mock.patch('vendors.bulk.record_changes', side_effect=IntegrityError('UNIQUE constraint failed')):
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['failed'], 2)
+        # No row is to blame for a failure of the whole batch.
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(response.data['batch_errors'], ['Batch rejected: UNIQUE constraint failed'])
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_wrong_content_type(self):
+        response = self.client.post(self.url, self.ndjson([self.order_row('PO-1')]), content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+
+class KeysetPaginationTests(APITests):
+    def setUp(self):
+        super().setUp()
+        self.vendors = [create_vendor(f'V{index}') for index in range(3)]
+        for index in range(23):
+            create_order(self.vendors[index % 2], f'PO-{index:02d}')
+
+    def walk(self, url, between_pages=None):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 5)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+            if between_pages:
+                between_pages()
+                between_pages = None
+        return ids
+
+    def test_purchase_orders(self):
+        ids = self.walk('/api/purchase_orders/?page_size=5')
+        self.assertEqual(ids, list(PurchaseOrder.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_purchase_orders_by_vendor(self):
+        vendor = self.vendors[1]
+        ids = self.walk(f'/api/purchase_orders/?page_size=5&vendor_id={vendor.pk}')
+        self.assertEqual(ids, list(PurchaseOrder.objects.filter(vendor=vendor).order_by('pk').values_list('pk', flat=True)))
+
+    def test_writes_between_pages(self):
+        first_page = list(PurchaseOrder.objects.order_by('pk').values_list('pk', flat=True)[:5])
+
+        def write():
+            # Rows before the cursor disappear and new ones are appended:
+            # neither shifts the rows still to come.
+            PurchaseOrder.objects.filter(pk__in=first_page[:2]).delete()
+            create_order(self.vendors[0], 'PO-new')
+            cache.clear()
+            local_cache.clear()
+
+        ids = self.walk('/api/purchase_orders/?page_size=5', between_pages=write)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(ids, first_page + list(
+            PurchaseOrder.objects.filter(pk__gt=first_page[-1]).order_by('pk').values_list('pk', flat=True)
+        ))
+
+    def test_vendors(self):
+        ids = self.walk('/api/vendors/?page_size=2')
+        self.assertEqual(ids, [vendor.pk for vendor in self.vendors])
+
+
+@override_settings(VMS_RESPONSE_CACHE={'ENABLED': True})
+class ResponseCacheTests(APITests):
+    def setUp(self):
+        super().setUp()
+        self.vendor = create_vendor('A')
+        create_order(self.vendor, 'PO-1')
+
+    def write(self, po_number):
+        # Scope versions are bumped on commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order(self.vendor, po_number)
+
+    def assertInvalidated(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.write(f'PO-{len(first.data) + 1}')
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(len(second.data), len(first.data) + 1)
+
+    def test_order_list(self):
+        self.assertInvalidated('/api/purchase_orders/')
+
+    def test_order_list_by_vendor(self):
+        for vendor_id in (str(self.vendor.pk), f'0{self.vendor.pk}', f'+{self.vendor.pk}'):
+            with self.subTest(vendor_id=vendor_id):
+                self.assertInvalidated(f'/api/purchase_orders/?vendor_id={vendor_id}')
+
+    def test_sku_orders_by_vendor(self):
+        self.assertInvalidated(f'/api/skus/SKU-1/purchase_orders/?vendor_id=0{self.vendor.pk}')
+
+    def test_invalid_vendor_id(self):
+        for url in ('/api/purchase_orders/?vendor_id=one', '/api/skus/SKU-1/purchase_orders/?vendor_id=1.0'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data, {'error': 'vendor_id must be an integer'})
+
+    def test_process_local_backend_fails_check(self):
+        # Version tokens in a per-process backend would leave other workers serving stale 304s.
+        self.assertEqual([error.id for error in check_response_cache_backend(None)], ['vendors.E001'])
+        with override_settings(VMS_RESPONSE_CACHE={'ENABLED': False}):
+            self.assertEqual(check_response_cache_backend(None), [])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_response_cache_backend(None), [])
+
+
+class AsyncViewTests(APITests):
+    def setUp(self):
+        super().setUp()
+        self.vendor = create_vendor('A')
+        create_order(self.vendor, 'PO-1')
+
+    def test_same_response_as_sync_views(self):
+        for path in ('vendors/', f'vendors/{self.vendor.pk}/', f'purchase_orders/?vendor_id={self.vendor.pk}'):
+            with self.subTest(path=path):
+                sync = self.client.get(f'/api/{path}', HTTP_ACCEPT='application/json')
+                response = self.client.get(f'/api/async/{path}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, sync.content)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        for path in ('vendors/', f'vendors/{self.vendor.pk}/', 'purchase_orders/', 'changes/'):
+            with self.subTest(path=path):
+                sync = self.client.get(f'/api/{path}', HTTP_ACCEPT='application/json')
+                response = self.client.get(f'/api/async/{path}')
+                self.assertEqual(sync.status_code, 401)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], sync['WWW-Authenticate'])
+                self.assertEqual(response.json(), sync.json())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class JWTAuthenticationTests(APITests):
+    def setUp(self):
+        super().setUp()
+        identity_cache.clear()
+        blacklist_cache.clear()
+        self.user = get_user_model().objects.create_user('buyer', password='secret-password')
+        response = self.client.post('/api/token/', {'username': 'buyer', 'password': 'secret-password'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.access, self.refresh = response.data['access'], response.data['refresh']
+
+    def authenticate(self):
+        request = RequestFactory().get('/api/vendors/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        return CachedJWTAuthentication().authenticate(request)
+
+    def test_warm_token_costs_no_queries(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.id, self.user.pk)
+        self.assertEqual(user.username, 'buyer')
+
+    def test_deactivated_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(self.client.get('/api/vendors/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/vendors/').status_code, 401)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access[:-2]}')
+        response = self.client.get('/api/vendors/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+    def test_refresh(self):
+        response = self.client.post('/api/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get('/api/vendors/').status_code, 200)
+
+        CachedRefreshToken(self.refresh).blacklist()
+        response = self.client.post('/api/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class VendorTopTests(APITests):
+    metrics = [
+        # on time, quality, response time, fulfillment
+        (0.9, 4.0, 3600.0, 0.8),
+        (0.5, 5.0, 600.0, 1.0),
+        (0.9, 4.0, 3600.0, 0.8),
+        (1.0, 2.0, 0.0, 0.5),
+        (0.2, 1.0, 86400.0, 0.1),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.vendors = [
+            create_vendor(f'V{index}', **dict(zip(SCORE_FIELDS, values))) for index, values in enumerate(self.metrics)
+        ]
+
+    def expected(self, weights):
+        scores = [(performance_score(dict(zip(SCORE_FIELDS, values)), weights), vendor.pk)
+                  for vendor, values in zip(self.vendors, self.metrics)]
+        return [pk for score, pk in sorted(scores, key=lambda row: (-row[0], row[1]))]
+
+    def assertRanking(self, response, weights, k):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['k'], k)
+        self.assertEqual([row['id'] for row in response.data['results']], self.expected(weights)[:k])
+        for row in response.data['results']:
+            values = [row[field] for field in SCORE_FIELDS]
+            self.assertAlmostEqual(row['score'], performance_score(dict(zip(SCORE_FIELDS, values)), weights))
+
+    def test_default_weights(self):
+        self.assertRanking(self.client.get('/api/vendors/top/?k=3'), score_weights(), 3)
+
+    def test_ties_by_id(self):
+        response = self.client.get('/api/vendors/top/?k=5')
+        ids = [row['id'] for row in response.data['results']]
+        self.assertLess(ids.index(self.vendors[0].pk), ids.index(self.vendors[2].pk))
+
+    def test_weights(self):
+        for raw, weights in (
+            ('on_time:1', {'on_time_delivery_rate': 1.0}),
+            ('quality:1,response_time:3', {'quality_rating_avg': 0.25, 'average_response_time': 0.75}),
+            ('fulfillment_rate:2,on_time_delivery_rate:2', {'fulfillment_rate': 0.5, 'on_time_delivery_rate': 0.5}),
+        ):
+            with self.subTest(weights=raw):
+                weights = {field: weights.get(field, 0.0) for field in SCORE_FIELDS}
+                response = self.client.get('/api/vendors/top/', {'k': 5, 'weights': raw})
+                self.assertEqual(response.data['weights'], weights)
+                self.assertRanking(response, weights, 5)
+
+    def test_explicit_default_weights(self):
+        raw = ','.join(f'{field}:{weight}' for field, weight in score_weights().items())
+        response = self.client.get('/api/vendors/top/', {'k': 5, 'weights': raw})
+        self.assertEqual(response.data['results'], self.client.get('/api/vendors/top/?k=5').data['results'])
+
+    def test_invalid(self):
+        for params in ({'k': 0}, {'k': 'ten'}, {'weights': 'speed:1'}, {'weights': 'on_time:-1'}, {'weights': 'on_time:0'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/vendors/top/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+
+
+class VendorSearchTests(APITests):
+    def add_vendor(self, code, name, address='a'):
+        return Vendor.objects.create(name=name, contact_details='c', address=address, vendor_code=code)
+
+    def search(self, q, **params):
+        response = self.client.get('/api/vendors/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_index_follows_writes(self):
+        vendor = self.add_vendor('A', 'Acme Tools')
+        self.assertEqual(self.search('acme'), [vendor.pk])
+
+        vendor.name = 'Zenith Tools'
+        vendor.save()
+        self.assertEqual(self.search('acme'), [])
+        self.assertEqual(self.search('zenith'), [vendor.pk])
+
+        Vendor.objects.filter(pk=vendor.pk).update(name='Nadir Tools')
+        self.assertEqual(self.search('zenith'), [])
+        self.assertEqual(self.search('nadir'), [vendor.pk])
+
+        vendor.delete()
+        self.assertEqual(self.search('tools'), [])
+
+    def test_prefix_matching(self):
+        vendor = self.add_vendor('A', 'Northwind Traders', address='12 Harbour Road')
+        self.add_vendor('B', 'Northern Lights')
+        self.assertEqual(self.search('northw'), [vendor.pk])
+        self.assertEqual(self.search('nor trad'), [vendor.pk])
+        self.assertEqual(self.search('Harb'), [vendor.pk])
+        self.assertEqual(self.search('trade northern'), [])
+
+    def test_name_matches_rank_first(self):
+        by_address = self.add_vendor('A', 'Globex', address='1 Acme Street')
+        by_name = self.add_vendor('B', 'Acme Supplies')
+        self.assertEqual(self.search('acme'), [by_name.pk, by_address.pk])
+        self.assertEqual(self.search('acme', limit=1), [by_name.pk])
+
+    def test_invalid_query(self):
+        for params in ({'q': ''}, {'q': ' -- '}, {'q': 'acme', 'limit': 0}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/vendors/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+        self.assertEqual(
+            self.client.get('/api/vendors/', {'q': '""'}).data, {'error': 'q must contain at least one word'}
+        )
+
+
+
+@unittest.skipUnless(analytics_available(), 'numpy is not installed')
+class AnalyticsReportTests(APITests):
+    orders = [
+        # vendor, order date, status, quality rating, hours to acknowledge, late
+        ('A', datetime(2024, 1, 10), 'completed', 4.5, 2, False),
+        ('A', datetime(2024, 1, 12), 'completed', 3.0, 6, True),
+        ('A', datetime(2024, 2, 3), 'pending', None, None, False),
+        ('B', datetime(2024, 1, 20), 'completed', 5.0, 1, False),
+        ('B', datetime(2024, 2, 14), 'completed', None, 30, False),
+        ('B', datetime(2024, 2, 15), 'canceled', None, 4, False),
+        ('C', datetime(2024, 2, 20), 'completed', 1.5, 12, True),
+    ]
+    snapshots = [
+        ('A', datetime(2024, 1, 31), 0.5, 3.75, 14400.0, 0.9),
+        ('B', datetime(2024, 1, 31), 1.0, 5.0, 3600.0, 1.0),
+        ('A', datetime(2024, 2, 29), 0.4, 3.5, 10800.0, 0.7),
+        ('C', datetime(2024, 2, 29), 0.0, 1.5, 43200.0, 1.0),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        vendors = {code: create_vendor(code) for code in 'ABC'}
+        now = timezone.now()
+        for number, (code, ordered, status, rating, hours, late) in enumerate(self.orders):
+            ordered = timezone.make_aware(ordered)
+            create_order(
+                vendors[code], f'PO-{number}', order_date=ordered, issue_date=ordered, status=status,
+                quality_rating=rating, acknowledgment_date=ordered + timedelta(hours=hours) if hours else None,
+                delivery_date=now + timedelta(days=-1 if late else 1),
+            )
+        for code, date, *values in self.snapshots:
+            HistoricalPerformance.objects.create(
+                vendor=vendors[code], date=timezone.make_aware(date),
+                **dict(zip(HISTORY_METRICS, values)),
+            )
+
+    def report(self):
+        response = self.client.get('/api/analytics/?refresh=1')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_order_statistics_match_orm(self):
+        report = self.report()['purchase_orders']
+        orders = PurchaseOrder.objects.all()
+        completed = orders.filter(status='completed')
+        self.assertEqual(report['orders'], orders.count())
+        self.assertEqual(report['vendors_with_orders'], orders.values('vendor').distinct().count())
+        statuses = dict(orders.values_list('status').annotate(count=Count('id')))
+        self.assertEqual(
+            report['status_counts'], {status: statuses.get(status, 0) for status, label in PurchaseOrder.STATUS_CHOICES},
+        )
+        self.assertAlmostEqual(
+            report['on_time_delivery']['rate'],
+            completed.filter(completion_date__lte=F('delivery_date')).count() / completed.count(),
+        )
+
+        vendor_responses = orders.filter(acknowledgment_date__isnull=False).values('vendor').annotate(
+            response=Avg(F('acknowledgment_date') - F('issue_date')),
+        )
+        expected = statistics.median(row['response'].total_seconds() for row in vendor_responses)
+        self.assertAlmostEqual(report['response_time_seconds']['vendor_averages']['p50'], expected, delta=0.01)
+
+        rated = completed.filter(quality_rating__isnull=False)
+        self.assertEqual(sum(row['count'] for row in report['quality_rating']['orders']), rated.count())
+        months = orders.annotate(month=TruncMonth('order_date')).values('month')
+        counts = {row['month'].strftime('%Y-%m'): row['count'] for row in months.annotate(count=Count('id'))}
+        qualities = {
+            row['month'].strftime('%Y-%m'): row['quality']
+            for row in months.filter(pk__in=rated).annotate(quality=Avg('quality_rating'))
+        }
+        self.assertEqual({row['month']: row['orders'] for row in report['monthly']}, counts)
+        for row in report['monthly']:
+            self.assertAlmostEqual(row['quality_rating_avg'], qualities[row['month']])
+
+    def test_history_statistics_match_orm(self):
+        report = self.report()['historical_performance']
+        averages = HistoricalPerformance.objects.annotate(month=TruncMonth('date')).values('month').annotate(
+            snapshots=Count('id'), on_time=Avg('on_time_delivery_rate'), response=Avg('average_response_time'),
+        ).order_by('month')
+        self.assertEqual([row['month'] for row in report], [row['month'].strftime('%Y-%m') for row in averages])
+        for row, expected in zip(report, averages):
+            self.assertEqual(row['snapshots'], expected['snapshots'])
+            self.assertAlmostEqual(row['on_time_delivery_rate'], expected['on_time'])
+            self.assertAlmostEqual(row['average_response_time'], expected['response'])
+        self.assertAlmostEqual(
+            report[1]['change']['on_time_delivery_rate'], averages[1]['on_time'] - averages[0]['on_time'],
+        )
+
+
+
+class RendererTests(APITests):
+    payloads = [
+        3.15e-05, -3.15e-05, 1e16, 0.0001, 1.5, 2 ** 70, -(2 ** 63), '0.00001', 'a\u2028b\u2029c',
+        [3.15e-05, 1e-07, -0.0, 123456789.125, [1e20, {'x': 0.00012}]],
+        {'rate': 1e-05, 'big': 1.5e16, 'price': Decimal('10.50'), 'when': datetime(2024, 1, 2, 3, 4, 5, 678901)},
+        {'nested': [{'name': 'Caf\u00e9', 'values': [0.1, 0.2, 0.30000000000000004]}], 'none': None, 'flag': True},
+    ]
+
+    def test_same_bytes_as_json_renderer(self):
+        for payload in self.payloads:
+            with self.subTest(payload=payload):
+                self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack_negotiation(self):
+        create_vendor('A', quality_rating_avg=3.15e-05)
+        response = self.client.get('/api/vendors/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get('/api/vendors/').json())
+
+        body = {'name': 'Vendor B', 'contact_details': 'c', 'address': 'a', 'vendor_code': 'B'}
+        response = self.client.post('/api/vendors/', msgpack.packb(body), content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Vendor.objects.get(vendor_code='B').name, 'Vendor B')
+
+    def test_gzip_threshold(self):
+        for index in range(20):
+            create_vendor(f'V{index}')
+        length = len(self.client.get('/api/vendors/').content)
+        for minimum, compressed in ((length, True), (length + 1, False)):
+            with self.subTest(minimum=minimum), override_settings(VMS_GZIP_MIN_LENGTH=minimum):
+                response = self.client.get('/api/vendors/', HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response.get('Content-Encoding') == 'gzip', compressed)
+                content = gzip.decompress(response.content) if compressed else response.content
+                self.assertEqual(len(content), length)
+
+
+class TransitionTests(RecountAssertions, APITests):
+    url = '/api/purchase_orders/transition/'
+
+    def setUp(self):
+        super().setUp()
+        self.vendors = [create_vendor('A'), create_vendor('B')]
+        self.pending = [create_order(self.vendors[index % 2], f'PO-{index}') for index in range(4)]
+        self.completed = create_order(self.vendors[0], 'PO-done', status='completed', quality_rating=4.0)
+
+    def transition(self, action, ids):
+        return self.client.post(self.url, {'action': action, 'ids': ids}, format='json')
+
+    def test_outcomes(self):
+        missing = self.completed.pk + 100
+        ids = [self.pending[0].pk, self.completed.pk, missing, self.pending[1].pk, self.pending[0].pk]
+        with mock.patch('vendors.scheduler.rebuild_vendor_metrics', wraps=rebuild_vendor_metrics) as rebuild:
+            response = self.transition('complete', ids)
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([(row['id'], row['status']) for row in response.data['results']], [
+            (self.pending[0].pk, 'updated'),
+            (self.completed.pk, 'rejected'),
+            (missing, 'not_found'),
+            (self.pending[1].pk, 'updated'),
+        ])
+        self.assertEqual(response.data['results'][1]['error'], 'Only pending purchase orders can be completed')
+
+        # One recount covering both vendors, not one per order.
+        rebuild.assert_called_once()
+        self.assertEqual(set(rebuild.call_args.args[0]), {vendor.pk for vendor in self.vendors})
+        for order in self.pending[:2]:
+            order.refresh_from_db()
+            self.assertEqual(order.status, 'completed')
+            self.assertIsNotNone(order.completion_date)
+        self.assertMatchesRecount()
+        self.assertEqual(
+            ChangeEvent.objects.filter(kind='purchase_order', action='update').count(), 2,
+        )
+
+    def test_all_updated(self):
+        ids = [order.pk for order in self.pending]
+        response = self.transition('acknowledge', ids)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 4)
+        self.assertFalse(PurchaseOrder.objects.filter(pk__in=ids, acknowledgment_date__isnull=True).exists())
+        self.assertMatchesRecount()
+
+        response = self.transition('acknowledge', ids)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual({row['status'] for row in response.data['results']}, {'rejected'})
+
+    def test_cancel(self):
+        response = self.transition('cancel', [self.pending[2].pk])
+        self.assertEqual(response.status_code, 200)
+        self.pending[2].refresh_from_db()
+        self.assertEqual(self.pending[2].status, 'canceled')
+        self.assertMatchesRecount()
+
+    def test_invalid_request(self):
+        for body in (
+            {'action': 'ship', 'ids': [self.pending[0].pk]},
+            {'action': 'complete', 'ids': []},
+            {'action': 'complete', 'ids': ['1']},
+            {'action': 'complete', 'ids': [True]},
+        ):
+            with self.subTest(body=body):
+                response = self.client.post(self.url, body, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(PurchaseOrder.objects.filter(status='completed').exclude(pk=self.completed.pk).exists())
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'BEGIN IMMEDIATE is SQLite specific')
+class WriteTransactionTests(TransactionTestCase):
+    """Saves read the stored order before writing, so they must hold SQLite's write lock from the start."""
+
+    def assertBeginsImmediate(self, write):
+        with CaptureQueriesContext(connection) as queries:
+            write()
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_saves_and_deletes(self):
+        vendor = create_vendor('A')
+        order = create_order(vendor, 'PO-1')
+        order.status = 'completed'
+        self.assertBeginsImmediate(order.save)
+        self.assertBeginsImmediate(lambda: vendor.save(update_fields=['name']))
+        self.assertBeginsImmediate(order.delete)
+        self.assertBeginsImmediate(vendor.delete)
+
+    def test_plain_atomic_unchanged(self):
+        with self.assertRaises(ValueError), write_transaction():
+            raise ValueError
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            create_vendor('A')
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN')
+
+
+class SparseFieldsTests(APITests):
+    def setUp(self):
+        super().setUp()
+        self.vendors = [create_vendor('A'), create_vendor('B')]
+        for index in range(4):
+            create_order(
+                self.vendors[index % 2], f'PO-{index}', items=[{'sku': 'SKU-1', 'quantity': index + 1}],
+                quality_rating=4.0 if index else None,
+            )
+
+    def full(self, serializer_class, queryset):
+        return json.loads(JSONRenderer().render(serializer_class(queryset, many=True).data))
+
+    def get(self, url):
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_full(self):
+        for url in ('/api/purchase_orders/', '/api/async/purchase_orders/', '/api/skus/SKU-1/purchase_orders/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url),
+                                 self.full(PurchaseOrderSerializer, PurchaseOrder.objects.order_by('pk')))
+
+    def test_fields(self):
+        expected = [
+            {'id': row['id'], 'po_number': row['po_number'], 'status': row['status']}
+            for row in self.full(PurchaseOrderSerializer, PurchaseOrder.objects.order_by('pk'))
+        ]
+        for url in ('/api/purchase_orders/?fields=status,id,po_number', '/api/async/purchase_orders/?fields=status,id,po_number'):
+            with self.subTest(url=url):
+                rows = self.get(url)
+                self.assertEqual(rows, expected)
+                # Serializer field order, not the order asked for.
+                self.assertEqual(list(rows[0]), ['id', 'po_number', 'status'])
+
+    def test_expand(self):
+        vendors = {row['id']: row for row in self.full(VendorSerializer, Vendor.objects.all())}
+        expected = [
+            {**row, 'vendor': vendors[row['vendor']]}
+            for row in self.full(PurchaseOrderSerializer, PurchaseOrder.objects.order_by('pk'))
+        ]
+        for url in ('/api/purchase_orders/?expand=vendor', '/api/async/purchase_orders/?expand=vendor'):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url), expected)
+        self.assertEqual(
+            self.get('/api/purchase_orders/?fields=id&expand=vendor'),
+            [{'id': row['id'], 'vendor': row['vendor']} for row in expected],
+        )
+
+    def test_paginated(self):
+        page = self.get('/api/purchase_orders/?page_size=3&fields=id,quality_rating&expand=vendor')
+        vendors = {row['id']: row for row in self.full(VendorSerializer, Vendor.objects.all())}
+        self.assertEqual(page['results'], [
+            {'id': row['id'], 'vendor': vendors[row['vendor']], 'quality_rating': row['quality_rating']}
+            for row in self.full(PurchaseOrderSerializer, PurchaseOrder.objects.order_by('pk')[:3])
+        ])
+
+    def test_unknown_names(self):
+        for url in (
+            '/api/purchase_orders/?fields=id,price',
+            '/api/purchase_orders/?expand=items',
+            '/api/async/purchase_orders/?fields=price',
+            '/api/async/purchase_orders/?expand=buyer',
+            '/api/skus/SKU-1/purchase_orders/?fields=price',
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class ChangeFeedTests(APITests):
+    url = '/api/changes/'
+
+    def setUp(self):
+        super().setUp()
+        self.vendor = create_vendor('A')
+        self.orders = [create_order(self.vendor, f'PO-{index}') for index in range(3)]
+
+    def events(self, since):
+        return [
+            (event.kind, event.action, event.object_id, event.vendor_id)
+            for event in ChangeEvent.objects.filter(pk__gt=since).order_by('pk')
+        ]
+
+    def read(self, since, **params):
+        response = self.client.get(self.url, {'since': '' if since is None else since, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_pages(self):
+        start = self.read(None)
+        self.assertEqual(start, {'events': [], 'next': ChangeEvent.objects.latest('pk').pk, 'has_more': False})
+        for order in self.orders:
+            order.quality_rating = 3.0
+            order.save()
+
+        seen = []
+        since = start['next']
+        while True:
+            page = self.read(since, limit=2)
+            self.assertLessEqual(len(page['events']), 2)
+            seen.extend(page['events'])
+            since = page['next']
+            if not page['has_more']:
+                break
+            self.assertEqual(since, page['events'][-1]['seq'])
+        self.assertEqual([(e['kind'], e['action'], e['id'], e['vendor_id']) for e in seen], self.events(start['next']))
+        self.assertEqual([e['seq'] for e in seen], sorted({e['seq'] for e in seen}))
+        self.assertEqual(self.read(since), {'events': [], 'next': since, 'has_more': False})
+
+    def test_filters(self):
+        other = create_vendor('B')
+        since = ChangeEvent.objects.latest('pk').pk
+        create_order(other, 'PO-other')
+        self.orders[0].delete()
+
+        page = self.read(since, vendor_id=other.pk, kind='purchase_order')
+        self.assertEqual([(e['action'], e['vendor_id']) for e in page['events']], [('create', other.pk)])
+        # next skips past the events the filters left out.
+        self.assertEqual(page['next'], ChangeEvent.objects.latest('pk').pk)
+        # Deleting a pending order lowers nothing but the order count, which moves no metric.
+        self.assertEqual(self.read(since, kind='vendor')['events'], [])
+
+    def test_metric_changes(self):
+        since = ChangeEvent.objects.latest('pk').pk
+        self.orders[0].status = 'completed'
+        self.orders[0].save()
+        self.assertEqual(self.events(since), [
+            ('purchase_order', 'update', self.orders[0].pk, self.vendor.pk),
+            ('vendor', 'update', self.vendor.pk, self.vendor.pk),
+        ])
+
+        since = ChangeEvent.objects.latest('pk').pk
+        self.orders[0].po_number = 'PO-renamed'
+        self.orders[0].save()
+        self.assertEqual(self.events(since), [('purchase_order', 'update', self.orders[0].pk, self.vendor.pk)])
+
+    def test_bulk_ingest_and_transitions(self):
+        since = ChangeEvent.objects.latest('pk').pk
+        now = timezone.now()
+        response = self.client.post('/api/purchase_orders/bulk/', [{
+            'po_number': f'PO-bulk-{index}', 'vendor': self.vendor.pk, 'order_date': now.isoformat(),
+            'delivery_date': (now + timedelta(days=1)).isoformat(), 'items': [{'sku': 'SKU-1', 'quantity': 1}],
+            'quantity': 1, 'status': 'completed', 'quality_rating': 4.0, 'issue_date': now.isoformat(),
+        } for index in range(2)], format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        created = response.data['ids']
+        self.assertEqual(self.events(since), [
+            *[('purchase_order', 'create', pk, self.vendor.pk) for pk in created],
+            ('vendor', 'update', self.vendor.pk, self.vendor.pk),
+        ])
+
+        since = ChangeEvent.objects.latest('pk').pk
+        pending = [order.pk for order in self.orders]
+        response = self.client.post(
+            '/api/purchase_orders/transition/', {'action': 'complete', 'ids': pending}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.events(since), [
+            *[('purchase_order', 'update', pk, self.vendor.pk) for pk in pending],
+            ('vendor', 'update', self.vendor.pk, self.vendor.pk),
+        ])
+
+    def test_expired_after_compaction(self):
+        latest = ChangeEvent.objects.latest('pk').pk
+        with override_settings(VMS_CHANGE_FEED={'MAX_EVENTS': 2}):
+            self.assertGreater(compact_changes(), 0)
+        for url in (self.url, '/api/async/changes/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'since': latest - 3})
+                self.assertEqual(response.status_code, 410)
+                self.assertEqual(response.json()['next'], latest)
+                # Resuming from just before the oldest retained event still works.
+                response = self.client.get(url, {'since': latest - 2})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([event['seq'] for event in response.json()['events']], [latest - 1, latest])
+
+    def test_invalid_params(self):
+        for params in ({'since': -1}, {'since': 'x'}, {'limit': 0}, {'wait': 'soon'}, {'kind': 'invoice'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class LineItemTests(APITests):
+    def setUp(self):
+        super().setUp()
+        self.vendors = [create_vendor('A'), create_vendor('B')]
+
+    def stored(self, order):
+        return list(
+            PurchaseOrderItem.objects.filter(purchase_order=order).order_by('position')
+            .values_list('vendor_id', 'sku', 'quantity')
+        )
+
+    def test_quantities(self):
+        self.assertEqual(line_items([
+            {'sku': 'A', 'quantity': ' 7 '}, {'sku': 'B', 'quantity': '-3'}, {'sku': 'C', 'quantity': 2.0},
+            {'sku': 'D', 'quantity': '--5'}, {'sku': 'E', 'quantity': '²'}, {'sku': 'F', 'quantity': 2.5},
+            {'sku': 'G', 'quantity': True}, {'sku': 'H'}, {'quantity': 1},
+        ]), [('A', 7), ('B', -3), ('C', 2), ('H', 1)])
+        self.assertEqual(line_items({'A': 1, 'B': 'x'}), [('A', 1)])
+
+    def test_create_update_delete(self):
+        now = timezone.now()
+        response = self.client.post('/api/purchase_orders/', {
+            'po_number': 'PO-1', 'vendor': self.vendors[0].pk, 'order_date': now.isoformat(),
+            'delivery_date': (now + timedelta(days=1)).isoformat(), 'quantity': 1, 'status': 'pending',
+            'issue_date': now.isoformat(), 'items': [{'sku': 'A', 'quantity': '--5'}, {'sku': 'B', 'quantity': 3}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        order = PurchaseOrder.objects.get(po_number='PO-1')
+        self.assertEqual(self.stored(order), [(self.vendors[0].pk, 'B', 3)])
+
+        url = f'/api/purchase_orders/{order.pk}/'
+        response = self.client.put(url, {'items': {'C': '²', 'D': 4, 'E': '2'}}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.stored(order), [(self.vendors[0].pk, 'D', 4), (self.vendors[0].pk, 'E', 2)])
+
+        self.client.put(url, {'vendor': self.vendors[1].pk}, format='json')
+        self.assertEqual(self.stored(order), [(self.vendors[1].pk, 'D', 4), (self.vendors[1].pk, 'E', 2)])
+
+        unchanged = list(PurchaseOrderItem.objects.filter(purchase_order=order).values_list('pk', flat=True))
+        self.client.put(url, {'quality_rating': 4.0}, format='json')
+        self.assertEqual(list(PurchaseOrderItem.objects.filter(purchase_order=order).values_list('pk', flat=True)), unchanged)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(PurchaseOrderItem.objects.filter(purchase_order_id=order.pk).exists())
+
+    def test_bulk_and_backfill(self):
+        order = create_order(self.vendors[0], 'PO-1', items=[{'sku': 'A', 'quantity': '--5'}, {'sku': 'B'}])
+        self.assertEqual(self.stored(order), [(self.vendors[0].pk, 'B', 1)])
+        PurchaseOrderItem.objects.all().delete()
+        self.assertEqual(backfill_line_items(), (1, 1))
+        self.assertEqual(self.stored(order), [(self.vendors[0].pk, 'B', 1)])
+
+        now = timezone.now()
+        response = self.client.post('/api/purchase_orders/bulk/', [{
+            'po_number': 'PO-bulk', 'vendor': self.vendors[1].pk, 'order_date': now.isoformat(),
+            'delivery_date': now.isoformat(), 'quantity': 1, 'status': 'pending', 'issue_date': now.isoformat(),
+            'items': [{'sku': 'A', 'quantity': '--5'}, {'sku': 'C', 'quantity': '6'}],
+        }], format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.stored(response.data['ids'][0]), [(self.vendors[1].pk, 'C', 6)])
+
+
+@override_settings(VMS_METRICS_MODE='queue')
+class QueuedMetricsTests(RecountAssertions, TestCase):
+    def setUp(self):
+        self.vendors = [create_vendor('A'), create_vendor('B')]
+
+    def test_coalesced_jobs(self):
+        for index in range(6):
+            create_order(self.vendors[index % 2], f'PO-{index}', status='completed', quality_rating=index % 5)
+        self.assertEqual(sorted(MetricRecomputeJob.objects.values_list('vendor_id', flat=True)),
+                         [vendor.pk for vendor in self.vendors])
+
+        with mock.patch('vendors.scheduler.rebuild_vendor_metrics', wraps=rebuild_vendor_metrics) as rebuild:
+            self.assertEqual(process_metric_jobs(), 2)
+            self.assertEqual(process_metric_jobs(), 0)
+        rebuild.assert_called_once()
+        self.assertFalse(MetricRecomputeJob.objects.exists())
+        self.assertMatchesRecount()
+
+    def test_failed_batch_is_requeued(self):
+        create_order(self.vendors[0], 'PO-1', status='completed', quality_rating=3.0)
+        with mock.patch('vendors.scheduler.rebuild_vendor_metrics', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                process_metric_jobs()
+        self.assertEqual(list(MetricRecomputeJob.objects.values_list('vendor_id', flat=True)), [self.vendors[0].pk])
+
+        self.assertEqual(process_metric_jobs(), 1)
+        self.assertMatchesRecount()
+
+
+@override_settings(VMS_METRICS_MODE='deferred', VMS_METRICS_WORKERS=1)
+class DeferredMetricsTests(RecountAssertions, TransactionTestCase):
+    """The thread pool needs committed data, hence TransactionTestCase.
+
+    The test database is a shared in-memory SQLite database, which answers
+    concurrent access with "table is locked" instead of waiting, so the worker
+    is held on ``release`` while the test writes.
+    """
+
+    def setUp(self):
+        self.vendors = [create_vendor('A'), create_vendor('B')]
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+        def rebuild(vendor_ids):
+            self.calls.append(sorted(vendor_ids))
+            self.release.wait(5)
+            return rebuild_vendor_metrics(vendor_ids)
+
+        patcher = mock.patch('vendors.scheduler.rebuild_vendor_metrics', side_effect=rebuild)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: (self.release.set(), wait_until_idle(5)))
+
+    def test_recounts_after_commit(self):
+        self.release.clear()
+        for index in range(4):
+            create_order(self.vendors[index % 2], f'PO-{index}', status='completed', quality_rating=4.0)
+        self.release.set()
+        self.assertTrue(wait_until_idle(5))
+        self.assertMatchesRecount()
+
+    def test_coalescing_while_busy(self):
+        self.release.clear()
+        create_order(self.vendors[0], 'PO-0')
+        # The only worker is stuck on vendor A: marks pile up in the pending set.
+        self.assertFalse(wait_until_idle(0.1))
+        for index in range(1, 5):
+            create_order(self.vendors[index % 2], f'PO-{index}', status='completed', quality_rating=2.0)
+        self.release.set()
+        self.assertTrue(wait_until_idle(5))
+
+        a, b = (vendor.pk for vendor in self.vendors)
+        # A marked again while being recounted is recounted once more afterwards, never concurrently.
+        self.assertEqual(self.calls[0], [a])
+        self.assertEqual(sorted(pk for call in self.calls[1:] for pk in call), [a, b])
+        self.assertMatchesRecount()
+
+    def test_failure_is_logged(self):
+        with mock.patch('vendors.scheduler.rebuild_vendor_metrics', side_effect=RuntimeError('boom')), \
+                self.assertLogs('vendors.scheduler', 'ERROR'):
+            create_order(self.vendors[0], 'PO-1')
+            self.assertTrue(wait_until_idle(5))
+        # The worker survives the failure.
+        self.release.clear()
+        create_order(self.vendors[0], 'PO-2', status='completed', quality_rating=5.0)
+        self.release.set()
+        self.assertTrue(wait_until_idle(5))
+        self.assertMatchesRecount()
@@ -0,0 +1,83 @@
+"""
+Batch state transitions of purchase orders.
+
+Each action names the state an order must be in and the columns it sets.
+Eligible orders are moved with one set-based ``UPDATE`` per batch, guarded by
+the same condition, instead of a ``save()`` per order. Updates bypass the
+per-order signals, so the metrics of every affected vendor are recomputed
+once afterwards and the change feed events are appended per batch, as for
+bulk ingestion.
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from .changes import record_changes
+from .db import write_transaction
+from .models import PurchaseOrder
+from .scheduler import mark_vendors_dirty
+
+TRANSITION_BATCH_SIZE = 500
+
+
+def _acknowledge(now):
+    return {'acknowledgment_date': now}
+
+
+def _complete(now):
+    return {'status': 'completed', 'completion_date': now}
+
+
+def _cancel(now):
+    return {'status': 'canceled', 'completion_date': None}
+
+
+# action: (condition an order must meet, its rejection message, new values)
+TRANSITIONS = {
+    'acknowledge': (Q(acknowledgment_date__isnull=True), 'Purchase Order already acknowledged', _acknowledge),
+    'complete': (Q(status='pending'), 'Only pending purchase orders can be completed', _complete),
+    'cancel': (Q(status='pending'), 'Only pending purchase orders can be canceled', _cancel),
+}
+
+
+def transition_purchase_orders(order_ids, action):
+    """Apply ``action`` to every eligible order of ``order_ids``.
+
+    Returns a summary with one result per distinct id, in input order. Raises
+    ``ValueError`` with a client-facing message on an unknown action.
+    """
+    if action not in TRANSITIONS:
+        raise ValueError(f'action must be one of: {", ".join(TRANSITIONS)}')
+    condition, rejection, new_values = TRANSITIONS[action]
+    order_ids = list(dict.fromkeys(order_ids))
+    values = new_values(timezone.now())
+    updated = set()
+    found = set()
+    affected_vendors = set()
+
+    with write_transaction():
+        for start in range(0, len(order_ids), TRANSITION_BATCH_SIZE):
+            batch = order_ids[start:start + TRANSITION_BATCH_SIZE]
+            orders = PurchaseOrder.objects.select_for_update().filter(pk__in=batch)
+            found.update(orders.values_list('pk', flat=True))
+            eligible = dict(orders.filter(condition).values_list('pk', 'vendor_id'))
+            if eligible:
+                PurchaseOrder.objects.filter(condition, pk__in=list(eligible)).update(**values)
+                record_changes('purchase_order', 'update', eligible.items())
+                updated.update(eligible)
+                affected_vendors.update(eligible.values())
+        mark_vendors_dirty(affected_vendors)
+
+    results = []
+    for pk in order_ids:
+        if pk in updated:
+            results.append({'id': pk, 'status': 'updated'})
+        elif pk in found:
+            results.append({'id': pk, 'status': 'rejected', 'error': rejection})
+        else:
+            results.append({'id': pk, 'status': 'not_found', 'error': 'Order not found'})
+    return {
+        'action': action,
+        'updated': len(updated),
+        'failed': len(order_ids) - len(updated),
+        'results': results,
+    }
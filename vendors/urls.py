@@ -1,8 +1,9 @@
 from .views import (
-    VendorAPIView, VendorUpdateDeleteRetrieveAPIView,
-    PurchaseOrderAPIView, PurchaseOrderRetrieveUpdateDeleteAPIView,
+    VendorAPIView, VendorTopAPIView, VendorUpdateDeleteRetrieveAPIView,
+    PurchaseOrderAPIView, PurchaseOrderRetrieveUpdateDeleteAPIView, PurchaseOrderBulkAPIView, PurchaseOrderTransitionAPIView,
     VendorHistoricalPerformanceAPIView, AcknowledgePurchaseOrderAPIView,
-    VendorSignupAPIView, LoginAPIView
+    SkuPurchaseOrdersAPIView, SkuVendorTotalsAPIView, AnalyticsAPIView, ChangeFeedAPIView,
+    VendorSignupAPIView, LoginAPIView, prometheus_metrics
     ) 
 from django.urls import path
 
@@ -12,11 +13,23 @@ urlpatterns = [
     path('login/', LoginAPIView.as_view(), name = 'login'),
 
     path('vendors/', VendorAPIView.as_view(), name='vendors'),
+    path('vendors/top/', VendorTopAPIView.as_view(), name='vendors-top'),
     path('vendors/<int:vendor_id>/', VendorUpdateDeleteRetrieveAPIView.as_view(), name='vendor-update-delete-retrieve'),
 
     path('purchase_orders/', PurchaseOrderAPIView.as_view(), name = 'purchase-orders'),
+    path('purchase_orders/bulk/', PurchaseOrderBulkAPIView.as_view(), name='purchase-orders-bulk'),
+    path('purchase_orders/transition/', PurchaseOrderTransitionAPIView.as_view(), name='purchase-orders-transition'),
     path('purchase_orders/<int:po_id>/', PurchaseOrderRetrieveUpdateDeleteAPIView.as_view(), name='purchase-orders-update-delete-retrieve'),
 
+    path('skus/<str:sku>/purchase_orders/', SkuPurchaseOrdersAPIView.as_view(), name='sku-purchase-orders'),
+    path('skus/<str:sku>/vendors/', SkuVendorTotalsAPIView.as_view(), name='sku-vendors'),
+
+    path('analytics/', AnalyticsAPIView.as_view(), name='analytics'),
+
+    path('changes/', ChangeFeedAPIView.as_view(), name='changes'),
+
     path('api/vendors/<int:vendor_id>/historical-performance', VendorHistoricalPerformanceAPIView.as_view()),
     path('api/purchase_orders/<int:po_id>/acknowledge', AcknowledgePurchaseOrderAPIView.as_view()),
+
+    path('_metrics', prometheus_metrics, name='metrics'),
 ]
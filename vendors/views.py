@@ -1,20 +1,36 @@
-from .serializers import VendorSerializer, PurchaseOrderSerializer, VendorSignupSerializer
-from .models import Vendor, PurchaseOrder, HistoricalPerformance
+from .serializers import VendorSerializer, PurchaseOrderSerializer, VendorSignupSerializer, PURCHASE_ORDER_EXPANSIONS
+from .models import Vendor, PurchaseOrder
+from .analytics import analytics_available, analytics_report
+from .bulk import TRANSACTION_MODES, ingest_purchase_orders
+from .cache import cache_response, vendor_scope
+from .changes import ChangesExpired, parse_change_params, wait_for_changes
+from .export import EXPORT_FORMATS, stream_export
+from .fastpath import FastReadSerializer, read_serializer
+from .history import history_query, parse_moment, serialize_history
+from .instrumentation import registry
+from .line_items import orders_with_sku, sku_vendor_totals
+from .pagination import KeysetPagination
+from .ranking import parse_k, parse_weights, score_weights, top_vendors
+from .search import search_vendors
+from .transitions import TRANSITIONS, transition_purchase_orders
+from .parsers import NDJSONParser
+from .renderers import CSVRenderer, NDJSONRenderer
 from rest_framework.views import APIView
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.exceptions import NotFound
-from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import CachedJWTAuthentication, CachedRefreshToken
 from django.contrib.auth import authenticate
+from django.http import HttpResponse
+from django.conf import settings
 
 class VendorSignupAPIView(APIView):
     permission_classes = [AllowAny]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def post(self, request):
         data = request.data
@@ -22,7 +38,7 @@ class VendorSignupAPIView(APIView):
 
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = CachedRefreshToken.for_user(user)
             tokens = {
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -51,7 +67,7 @@ class LoginAPIView(APIView):
 
         user = authenticate(request, username=username, password=password)
         if user:
-            refresh = RefreshToken.for_user(user)
+            refresh = CachedRefreshToken.for_user(user)
             access_token = str(refresh.access_token)
             user_serializer = VendorSignupSerializer(user)
             return Response({
@@ -65,10 +81,41 @@ class LoginAPIView(APIView):
 
 
 class VendorAPIView(APIView):
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer, CSVRenderer]
+
+    @cache_response(lambda request: ['vendors'])
     def get(self, request):
+        if 'q' in request.query_params:
+            return self.search(request)
+
         vendor = Vendor.objects.all()
-        serializer = VendorSerializer(vendor, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if request.accepted_renderer.format in EXPORT_FORMATS:
+            return stream_export(vendor, VendorSerializer, request.accepted_renderer.format, 'vendors')
+
+        paginator = KeysetPagination()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(vendor, request, view=self)
+            return paginator.get_paginated_response(VendorSerializer(page, many=True).data)
+
+        return Response(FastReadSerializer(VendorSerializer).data(vendor), status=status.HTTP_200_OK)
+
+    def search(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.VMS_SEARCH_MAX_RESULTS))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            vendor_ids = search_vendors(request.query_params['q'], min(limit, settings.VMS_SEARCH_MAX_RESULTS))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Keep the ranking order of the search.
+        vendors = {row['id']: row for row in FastReadSerializer(VendorSerializer).data(
+            Vendor.objects.filter(pk__in=vendor_ids)
+        )}
+        return Response([vendors[pk] for pk in vendor_ids if pk in vendors], status=status.HTTP_200_OK)
 
     def post(self,request):
         
@@ -84,6 +131,35 @@ class VendorAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+class VendorTopAPIView(APIView):
+    @cache_response(lambda request: ['vendors'])
+    def get(self, request):
+        try:
+            k = parse_k(request.query_params.get('k', 10))
+            weights = parse_weights(request.query_params['weights']) if request.query_params.get('weights') else score_weights()
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranking = top_vendors(k, weights)
+        vendors = {row['id']: row for row in FastReadSerializer(VendorSerializer).data(
+            Vendor.objects.filter(pk__in=[pk for pk, score in ranking])
+        )}
+        return Response({
+            'k': k,
+            'weights': weights,
+            'results': [{**vendors[pk], 'score': score} for pk, score in ranking if pk in vendors],
+        }, status=status.HTTP_200_OK)
+
+
+class AnalyticsAPIView(APIView):
+    def get(self, request):
+        if not analytics_available():
+            return Response({'error': 'Analytics require numpy to be installed'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        refresh = request.query_params.get('refresh', '').lower() in ('1', 'true')
+        return Response(analytics_report(refresh=refresh), status=status.HTTP_200_OK)
+
+
 class VendorUpdateDeleteRetrieveAPIView(APIView):
     def get_object(self, vendor_id):
         try:
@@ -92,6 +168,7 @@ class VendorUpdateDeleteRetrieveAPIView(APIView):
             raise NotFound('Vendor not found')
         
 
+    @cache_response(lambda request, vendor_id: [vendor_scope(vendor_id)])
     def get(self, request, vendor_id):
         vendor = self.get_object(vendor_id)
         serializer = VendorSerializer(vendor)
@@ -113,19 +190,73 @@ class VendorUpdateDeleteRetrieveAPIView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def parse_vendor_id(params):
+    """Return the ``vendor_id`` query parameter as an int, ``None`` if it is absent.
+
+    Raises ``ValueError`` with a client-facing message on invalid input.
+    """
+    raw = params.get('vendor_id')
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError('vendor_id must be an integer') from None
+
+
+def order_list_scopes(request, **kwargs):
+    """Cache scopes of a purchase order list, by the normalized ``vendor_id`` filter.
+
+    ``?vendor_id=01`` must land in the scope a write to vendor 1 bumps.
+    """
+    try:
+        vendor_id = parse_vendor_id(request.query_params)
+    except ValueError:
+        # Answered with a 400, which is never cached.
+        vendor_id = None
+    return [vendor_scope(vendor_id) if vendor_id is not None else 'orders']
+
+
+def purchase_order_list_response(request, view, orders, reader):
+    """Serialize ``orders`` with ``reader``, one page at a time if the client asks for pages."""
+    paginator = KeysetPagination()
+    if paginator.is_requested(request):
+        page = paginator.paginate_queryset(reader.values(orders, 'id'), request, view=view)
+        return paginator.get_paginated_response([reader.convert_values(row) for row in page])
+
+    return Response(reader.data(orders), status=status.HTTP_200_OK)
+
+
 class PurchaseOrderAPIView(APIView):
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer, CSVRenderer]
+
+    @cache_response(order_list_scopes)
     def get(self, request):
-        vendor_id = request.query_params.get('vendor_id')
-        
-        if vendor_id:
+        try:
+            vendor_id = parse_vendor_id(request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if vendor_id is not None:
             # Filters out purchase orders by vendor ID
             orders = PurchaseOrder.objects.filter(vendor_id=vendor_id)
         else:
             # If vendor ID is not provided, retrieving all purchase orders
             orders = PurchaseOrder.objects.all()
+        # In id order also when ?expand= joins the vendors.
+        orders = orders.order_by('pk')
 
-        serializer = PurchaseOrderSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            reader = read_serializer(PurchaseOrderSerializer, request.query_params, PURCHASE_ORDER_EXPANSIONS)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.accepted_renderer.format in EXPORT_FORMATS:
+            return stream_export(
+                orders, PurchaseOrderSerializer, request.accepted_renderer.format, 'purchase_orders', reader=reader,
+            )
+
+        return purchase_order_list_response(request, self, orders, reader)
     
     def post(self, request):
         serializer = PurchaseOrderSerializer(data=request.data)
@@ -139,6 +270,68 @@ class PurchaseOrderAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+class PurchaseOrderBulkAPIView(APIView):
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + [NDJSONParser]
+
+    def post(self, request):
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of purchase orders'}, status=status.HTTP_400_BAD_REQUEST)
+
+        mode = request.query_params.get('transaction', settings.VMS_BULK_TRANSACTION_MODE)
+        if mode not in TRANSACTION_MODES:
+            return Response({'error': f'transaction must be one of: {", ".join(TRANSACTION_MODES)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        result = ingest_purchase_orders(request.data, mode=mode, chunk_size=settings.VMS_BULK_CHUNK_SIZE)
+
+        if not result['failed']:
+            response_status = status.HTTP_201_CREATED
+        elif result['created']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(result, status=response_status)
+
+
+class PurchaseOrderTransitionAPIView(APIView):
+    def post(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        action = data.get('action')
+        if action not in TRANSITIONS:
+            return Response({'error': f'action must be one of: {", ".join(TRANSITIONS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids or not all(
+            isinstance(pk, int) and not isinstance(pk, bool) for pk in ids
+        ):
+            return Response({'error': 'ids must be a non-empty list of purchase order ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        result = transition_purchase_orders(ids, action)
+
+        if not result['failed']:
+            response_status = status.HTTP_200_OK
+        elif result['updated']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(result, status=response_status)
+
+
+class ChangeFeedAPIView(APIView):
+    def get(self, request):
+        try:
+            params = parse_change_params(request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = wait_for_changes(**params)
+        except ChangesExpired as exc:
+            return Response({'error': str(exc), 'next': exc.latest}, status=status.HTTP_410_GONE)
+        return Response(page, status=status.HTTP_200_OK)
+
+
 class PurchaseOrderRetrieveUpdateDeleteAPIView(APIView):
     def get_object(self, po_id):
         try:
@@ -146,6 +339,7 @@ class PurchaseOrderRetrieveUpdateDeleteAPIView(APIView):
         except PurchaseOrder.DoesNotExist:
             raise NotFound('Order not found')
         
+    @cache_response(lambda request, po_id: ['orders'])
     def get(self, request, po_id):
         order = self.get_object(po_id)
         serializer = PurchaseOrderSerializer(order)
@@ -167,25 +361,53 @@ class PurchaseOrderRetrieveUpdateDeleteAPIView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class SkuPurchaseOrdersAPIView(APIView):
+    @cache_response(order_list_scopes)
+    def get(self, request, sku):
+        try:
+            orders = orders_with_sku(sku, parse_vendor_id(request.query_params))
+            reader = read_serializer(PurchaseOrderSerializer, request.query_params, PURCHASE_ORDER_EXPANSIONS)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return purchase_order_list_response(request, self, orders, reader)
+
+
+class SkuVendorTotalsAPIView(APIView):
+    @cache_response(lambda request, sku: ['orders'])
+    def get(self, request, sku):
+        try:
+            start = parse_moment(request.query_params['from']) if 'from' in request.query_params else None
+            end = parse_moment(request.query_params['to'], end_of_day=True) if 'to' in request.query_params else None
+        except ValueError as exc:
+            return Response({'error': f'Invalid date: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        totals = [
+            {
+                'vendor': row['vendor_id'],
+                'orders': row['orders'],
+                'lines': row['lines'],
+                'quantity': row['quantity'],
+                'first_order': row['first_order'],
+                'last_order': row['last_order'],
+            }
+            for row in sku_vendor_totals(sku, start, end)
+        ]
+        return Response(totals, status=status.HTTP_200_OK)
+
+
 class VendorHistoricalPerformanceAPIView(APIView):
+    @cache_response(lambda request, vendor_id: [vendor_scope(vendor_id), 'history'])
     def get(self, request, vendor_id):
         vendor = get_object_or_404(Vendor, pk=vendor_id)
-        
+
         # Retrieval of historical performance data for the vendor
-        historical_data = HistoricalPerformance.objects.filter(vendor=vendor)
-        
-        serialized_data = []
-        for record in historical_data:
-            serialized_record = {
-                'date': record.date,
-                'on_time_delivery_rate': record.on_time_delivery_rate,
-                'quality_rating_avg': record.quality_rating_avg,
-                'average_response_time': record.average_response_time,
-                'fulfillment_rate': record.fulfillment_rate,
-            }
-            serialized_data.append(serialized_record)
-        
-        return JsonResponse(serialized_data, safe=False)
+        try:
+            historical_data, bucketed = history_query(vendor.pk, request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(serialize_history(historical_data, bucketed), status=status.HTTP_200_OK)
     
 
 class AcknowledgePurchaseOrderAPIView(APIView):
@@ -201,3 +423,7 @@ class AcknowledgePurchaseOrderAPIView(APIView):
         purchase_order.save()
         
         return Response({'message': 'Purchase Order acknowledged successfully'}, status=200)
+
+
+def prometheus_metrics(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
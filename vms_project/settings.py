@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 
@@ -48,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'vendors.middleware.RequestMetricsMiddleware',
+    'vendors.middleware.CompressionMiddleware',
+    'vendors.middleware.ReadOnlyRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,12 +80,32 @@ TEMPLATES = [
     },
 ]
 
+# JSON is rendered and parsed with orjson when it is installed, with output
+# identical to DRF's own JSONRenderer. MessagePack (Accept/Content-Type:
+# application/msgpack) is offered when msgpack is installed.
+
+MSGPACK_INSTALLED = find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'vendors.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'vendors.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['vendors.renderers.MessagePackRenderer'] if MSGPACK_INSTALLED else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'vendors.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ] + (['vendors.parsers.MessagePackParser'] if MSGPACK_INSTALLED else []),
 }
 
+# Responses of at least this many bytes are gzip-compressed for clients that
+# accept it (vendors.middleware.CompressionMiddleware).
+
+VMS_GZIP_MIN_LENGTH = 1024
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
@@ -114,8 +139,8 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "vendors.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "vendors.serializers.TokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
@@ -125,16 +150,163 @@ SIMPLE_JWT = {
 WSGI_APPLICATION = 'vms_project.wsgi.application'
 
 
+# Vendor metric recomputation
+# 'sync' updates metrics inside the request, 'deferred' recounts them in an
+# in-process thread pool after commit, 'queue' leaves them to
+# `manage.py process_metric_jobs`.
+
+VMS_METRICS_MODE = 'sync'
+VMS_METRICS_WORKERS = 2
+
+
+# Bulk purchase order ingest (POST /api/purchase_orders/bulk/)
+# 'atomic' rejects the whole batch on any error, 'chunk' commits each chunk
+# of VMS_BULK_CHUNK_SIZE rows independently. Overridable per request with
+# ?transaction=.
+
+VMS_BULK_TRANSACTION_MODE = 'atomic'
+VMS_BULK_CHUNK_SIZE = 500
+
+
+# Streaming exports (?format=ndjson / ?format=csv on the list endpoints):
+# rows fetched from the database per round-trip.
+
+VMS_EXPORT_CHUNK_SIZE = 2000
+
+
+# Cursor pagination of the list endpoints, used when ?cursor= or ?page_size=
+# is given.
+
+VMS_PAGE_SIZE = 100
+VMS_MAX_PAGE_SIZE = 1000
+
+
+# HistoricalPerformance snapshots (`manage.py snapshot_vendor_performance`):
+# one row per vendor per 'hour' or 'day'.
+
+VMS_SNAPSHOT_BUCKET = 'day'
+
+# Upper bound on the points returned by the historical performance endpoint.
+
+VMS_HISTORY_MAX_POINTS = 1000
+
+
+# Vendor leaderboard (GET /api/vendors/top/). The weights of the stored
+# performance_score; run `manage.py rebuild_vendor_metrics` after changing them.
+
+VMS_SCORE_WEIGHTS = {
+    'on_time_delivery_rate': 0.35,
+    'quality_rating_avg': 0.35,
+    'average_response_time': 0.1,
+    'fulfillment_rate': 0.2,
+}
+VMS_TOP_K_MAX = 100
+
+# Vendor search (GET /api/vendors/?q=): upper bound on the ranked results.
+
+VMS_SEARCH_MAX_RESULTS = 100
+
+# Cross-vendor analytics report (GET /api/analytics/, requires numpy): seconds
+# the report is kept in the default cache before it is recomputed.
+
+VMS_ANALYTICS_TTL = 300
+
+# Change feed (GET /api/changes/?since=, vendors.changes): events per page,
+# the longest ?wait= long-poll in seconds, how often waiters look for events
+# of other processes, and the retention after which `manage.py
+# compact_changes` (also run every COMPACT_EVERY events) truncates the log.
+
+VMS_CHANGE_FEED = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 1000,
+    'MAX_WAIT': 30,
+    'POLL_INTERVAL': 1.0,
+    'RETENTION': 7 * 24 * 3600,
+    'MAX_EVENTS': 1000000,
+    'COMPACT_EVERY': 10000,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Point 'default' at a shared backend (Redis, Memcached) when running more
+# than one process so that cache invalidation reaches every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Versioned response cache and ETags for the read endpoints (vendors.cache).
+# Version tokens live in the CACHE_ALIAS backend, so with a process-local
+# backend a write would only invalidate the responses of its own process: the
+# cache is off until 'default' points at a shared backend, and enabling it
+# anyway fails the vendors.E001 system check.
+
+VMS_RESPONSE_CACHE = {
+    'ENABLED': CACHES['default']['BACKEND'] not in (
+        'django.core.cache.backends.locmem.LocMemCache',
+        'django.core.cache.backends.dummy.DummyCache',
+    ),
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_MAX_ENTRIES': 512,
+}
+
+# In-process caches of the JWT authentication (vendors.authentication):
+# seconds a user's existence/active state and a refresh token's blacklist
+# status are trusted before being looked up again.
+
+VMS_AUTH_CACHE = {
+    'IDENTITY_TTL': 60,
+    'BLACKLIST_TTL': 10,
+    'MAX_ENTRIES': 10000,
+}
+
+
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': Path(os.environ.get('VMS_DB_NAME', BASE_DIR / 'db.sqlite3')),
     }
 }
 
+# VMS_DB_PROFILE=production switches SQLite to WAL with tuned pragmas (applied
+# by vendors.db.configure_sqlite), keeps connections open between requests and
+# serves GET requests from a read-only 'replica' connection, either to the same
+# file or to VMS_DB_REPLICA_NAME (a replicated copy).
+
+VMS_DB_PROFILE = os.environ.get('VMS_DB_PROFILE', 'default')
+VMS_SQLITE_PRAGMAS = {}
+
+if VMS_DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20},
+    })
+    replica_name = Path(os.environ.get('VMS_DB_REPLICA_NAME', DATABASES['default']['NAME']))
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': f'file:{replica_name}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['vendors.db.ReadReplicaRouter']
+    VMS_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'busy_timeout': 20000,
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,
+        'cache_size': -65536,
+        'temp_store': 'MEMORY',
+    }
+elif VMS_DB_PROFILE != 'default':
+    raise ValueError(f"VMS_DB_PROFILE must be 'default' or 'production', not {VMS_DB_PROFILE!r}")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators